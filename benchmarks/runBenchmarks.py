@@ -0,0 +1,212 @@
+"""Benchmark suite for the CDM pipeline on synthetic data.
+
+Times read_data, apply_transformations, generate_metadata and CSV
+serialization separately at each dataset size, and records throughput and
+peak memory to a JSON results file that can be compared between versions:
+
+    python benchmarks/runBenchmarks.py --rows 100000 1000000 10000000
+    python benchmarks/runBenchmarks.py --rows 100000 --compare benchmarks/results/<old>.json
+
+Synthetic CSVs are cached in benchmarks/data/ so repeated runs only pay for
+generation once.
+
+Peak memory is the rise in resident set size while a stage runs, measured in
+a fresh process. Unlike tracemalloc this includes memory outside the Python
+allocator, such as Arrow's memory pool and NumPy buffers.
+"""
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from multiprocessing import get_context
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+BENCH_DIR = Path(__file__).resolve().parent
+ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(ROOT))
+
+from cdmIngest import read_data  # noqa: E402
+from cdmOutput import write_csv  # noqa: E402
+from cdmTransform import apply_transformations, compile_mapping, generate_metadata  # noqa: E402
+from syntheticData import SYNTHETIC_MAPPINGS, write_synthetic_csv  # noqa: E402
+
+DATA_DIR = BENCH_DIR / "data"
+RESULTS_DIR = BENCH_DIR / "results"
+DEFAULT_ROWS = [100_000, 1_000_000, 10_000_000]
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def dataset_path(rows, seed):
+    """Path of the cached synthetic CSV, generating it on first use."""
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    path = DATA_DIR / f"synthetic_{rows}_{seed}.csv"
+    if not path.exists():
+        print(f"Generating {rows:,} rows -> {path}", file=sys.stderr)
+        tmp_path = path.with_suffix(".tmp")
+        write_synthetic_csv(tmp_path, rows, seed=seed)
+        os.replace(tmp_path, path)
+    return path
+
+def measure(func, *args):
+    """Run ``func`` once timed. Returns (result, seconds)."""
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def _status_bytes(field):
+    """A memory field of /proc/self/status (Linux), e.g. VmRSS, in bytes."""
+    with open("/proc/self/status", encoding="ascii") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) * 1024
+    raise OSError(f"{field} not in /proc/self/status")
+
+def _reset_peak_rss():
+    """Reset the process's peak RSS to its current RSS and return that.
+
+    Needs Linux; elsewhere returns 0, so the process's whole peak is reported.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w", encoding="ascii") as f:
+            f.write("5")
+        return _status_bytes("VmRSS")
+    except OSError:
+        return 0
+
+def _peak_rss():
+    try:
+        return _status_bytes("VmHWM")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # bytes on macOS
+
+def stage_peak_memory(path, stage):
+    """Worker: rebuild the inputs of ``stage``, run it, and return the rise in peak RSS it caused."""
+    plan = compile_mapping(SYNTHETIC_MAPPINGS)
+    if stage == "read_data":
+        run_stage = partial(read_data, path, plan)
+    else:
+        df = read_data(path, plan)
+        if stage == "apply_transformations":
+            run_stage = partial(apply_transformations, df, plan)
+        else:
+            cdm_df = apply_transformations(df, plan)
+            del df
+            if stage == "generate_metadata":
+                run_stage = partial(generate_metadata, cdm_df, path.name, "synthetic_mapping.yaml")
+            else:
+                run_stage = partial(serialize_csv, cdm_df)
+    gc.collect()
+    baseline = _reset_peak_rss()
+    run_stage()
+    return _peak_rss() - baseline
+
+def peak_memory(path, stage):
+    """Peak memory of one stage, measured in a fresh (spawned) process so earlier stages do not count."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+        return executor.submit(stage_peak_memory, path, stage).result()
+
+def serialize_csv(cdm_df):
+    """Write the CDM CSV to a temporary file and return its size."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "cdm.csv"
+        write_csv(cdm_df, path)
+        return path.stat().st_size
+
+def run_size(rows, seed, memory):
+    """Benchmark every stage for one dataset size."""
+    path = dataset_path(rows, seed)
+    plan = compile_mapping(SYNTHETIC_MAPPINGS)
+    stages = []
+
+    def record(stage, seconds):
+        peak = peak_memory(path, stage) if memory else None
+        stages.append({
+            "rows": rows,
+            "stage": stage,
+            "seconds": round(seconds, 4),
+            "rows_per_second": round(rows / seconds) if seconds else None,
+            "peak_rss_bytes": peak,
+        })
+        peak_text = f"{peak / 2**20:10.1f} MiB" if peak is not None else ""
+        print(f"{rows:>12,} {stage:<22} {seconds:9.3f} s {rows / seconds:>14,.0f} rows/s {peak_text}", file=sys.stderr)
+
+    df, seconds = measure(read_data, path, plan)
+    record("read_data", seconds)
+    cdm_df, seconds = measure(apply_transformations, df, plan)
+    record("apply_transformations", seconds)
+    del df
+    _, seconds = measure(generate_metadata, cdm_df, path.name, "synthetic_mapping.yaml")
+    record("generate_metadata", seconds)
+    _, seconds = measure(serialize_csv, cdm_df)
+    record("csv_serialization", seconds)
+    return stages
+
+def compare(results, baseline_path):
+    """Print per stage and size how the current run relates to a baseline results file."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    old = {(item["rows"], item["stage"]): item for item in baseline["results"]}
+    print(f"\nCompared with {baseline['meta']['revision']} ({baseline_path}):")
+    for item in results:
+        before = old.get((item["rows"], item["stage"]))
+        if before is None:
+            continue
+        ratio = before["seconds"] / item["seconds"] if item["seconds"] else np.nan
+        print(f"{item['rows']:>12,} {item['stage']:<22} {before['seconds']:9.3f} s -> {item['seconds']:9.3f} s ({ratio:5.2f}x)")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the CDM pipeline on synthetic data.")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, help="Results JSON (default: benchmarks/results/<revision>.json)")
+    parser.add_argument("--compare", type=Path, help="Earlier results JSON to compare against")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the extra run of each stage in a fresh process that measures its peak memory")
+    args = parser.parse_args(argv)
+
+    revision = git_revision()
+    results = []
+    for rows in args.rows:
+        results.extend(run_size(rows, args.seed, memory=not args.no_memory))
+
+    report = {
+        "meta": {
+            "revision": revision,
+            "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    output = args.output or RESULTS_DIR / f"{revision}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4)
+    print(f"Results written to {output}", file=sys.stderr)
+
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == "__main__":
+    main()
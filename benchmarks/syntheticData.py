@@ -0,0 +1,115 @@
+"""Synthetic hospital extracts shaped like mock_dataset.csv, at any size.
+
+The generated data has the same columns as mock_dataset.csv and the same
+kind of messiness: every date column has a main format plus a share of rows
+in other formats, categories come in mixed case, and values are missing at
+random. Generation is vectorized and seeded, so a given (rows, seed) always
+produces the same file.
+"""
+import numpy as np
+import pandas as pd
+
+COLUMNS = [
+    "", "patient_identifier", "surgery_type", "operation_date", "side_of_operation", "prior_surgery",
+    "discharge_datetime", "readmit_date", "specialty", "reop_date", "sample_id", "culture_material",
+    "microbiology_result", "antibiotic_code", "antibiotic_start", "antibiotic_end",
+]
+
+# Main format of each date column (as in mock_dataset.csv) and the formats mixed in.
+DATE_COLUMNS = {
+    "operation_date": ("%Y-%m-%d", ["%d-%m-%Y"]),
+    "discharge_datetime": ("%Y-%m-%d %H:%M:%S", ["%Y-%m-%d"]),
+    "readmit_date": ("%m/%d/%Y", ["%Y-%m-%d"]),
+    "reop_date": ("%d-%m-%Y", ["%Y/%m/%d"]),
+    "antibiotic_start": ("%Y/%m/%d", ["%d/%m/%Y"]),
+    "antibiotic_end": ("%d/%m/%Y", ["%Y-%m-%d"]),
+}
+
+CATEGORY_COLUMNS = {
+    "surgery_type": ["TotalKnee", "HipReplacement", "PartialKnee", "totalknee", "HIPREPLACEMENT"],
+    "side_of_operation": ["Left", "Right", "left", "RIGHT"],
+    "prior_surgery": ["No", "Yes", "no", "YES"],
+    "specialty": ["Orthopedics", "GeneralSurgery", "TraumaUnit", "orthopedics", "generalsurgery"],
+    "culture_material": ["BloodSample", "WoundFluid", "bloodsample", "WOUNDFLUID"],
+    "microbiology_result": ["Negative", "Positive", "negative", "POSITIVE"],
+}
+
+# Mapping YAML content for the synthetic columns, case variants included.
+SYNTHETIC_MAPPINGS = {
+    "patient_identifier": {"cdm_field": "Patient ID"},
+    "surgery_type": {"cdm_field": "Primary Intervention", "transformation": {"value_mapping": {
+        "TotalKnee": "TOTKNIE", "totalknee": "TOTKNIE", "HipReplacement": "HIPPR",
+        "HIPREPLACEMENT": "HIPPR", "PartialKnee": "HMKNIE"}}},
+    "operation_date": {"cdm_field": "Date of Surgery"},
+    "side_of_operation": {"cdm_field": "Operation Side", "transformation": {"value_mapping": {
+        "Left": "left", "left": "left", "Right": "right", "RIGHT": "right"}}},
+    "prior_surgery": {"cdm_field": "Previous Intervention"},
+    "discharge_datetime": {"cdm_field": "Discharge Date"},
+    "readmit_date": {"cdm_field": "Readmission Date"},
+    "specialty": {"cdm_field": "Treating Specialty", "transformation": {"value_mapping": {
+        "Orthopedics": "orthopedic surgeon", "orthopedics": "orthopedic surgeon",
+        "GeneralSurgery": "general surgeon", "generalsurgery": "general surgeon",
+        "TraumaUnit": "trauma surgeon"}}},
+    "reop_date": {"cdm_field": "Reoperation Date"},
+    "sample_id": {"cdm_field": "Sample number culture collection"},
+    "culture_material": {"cdm_field": "Breeding Material", "transformation": {"value_mapping": {
+        "BloodSample": "blood (sample)", "bloodsample": "blood (sample)",
+        "WoundFluid": "wound fluid sample (sample)", "WOUNDFLUID": "wound fluid sample (sample)"}}},
+    "microbiology_result": {"cdm_field": "Result", "transformation": {"value_mapping": {
+        "Positive": "positive", "POSITIVE": "positive", "Negative": "negative", "negative": "negative"}}},
+    "antibiotic_code": {"cdm_field": "Antibiotic Code"},
+    "antibiotic_start": {"cdm_field": "Prescription Start Date"},
+    "antibiotic_end": {"cdm_field": "Prescription End Date"},
+}
+
+DATE_RANGE = pd.date_range("2019-01-01", "2023-12-31", freq="D")
+
+def _with_missing(values, rng, missing_rate):
+    """Object array with ``missing_rate`` of the entries replaced by None."""
+    values = values.astype(object)
+    values[rng.random(len(values)) < missing_rate] = None
+    return values
+
+def _dates(rng, rows, main_format, other_formats, mixed_rate, missing_rate):
+    """Date strings, mostly in ``main_format`` with ``mixed_rate`` in the other formats."""
+    formats = [main_format] + other_formats
+    formatted = np.stack([np.asarray(DATE_RANGE.strftime(fmt), dtype=object) for fmt in formats])
+    day = rng.integers(0, len(DATE_RANGE), rows)
+    which = np.where(rng.random(rows) < mixed_rate, rng.integers(1, len(formats), rows), 0)
+    return _with_missing(formatted[which, day], rng, missing_rate)
+
+def make_synthetic_dataset(rows, seed=0, missing_rate=0.05, mixed_rate=0.1, start=0):
+    """Build a DataFrame of ``rows`` rows with the columns of mock_dataset.csv.
+
+    ``start`` offsets the leading index column, so consecutive calls can
+    produce the pieces of one larger file.
+    """
+    rng = np.random.default_rng(seed)
+    patients = max(rows // 3, 1)
+    patient_pool = np.array([f"{value:08x}" for value in rng.integers(0, 2**32, patients)], dtype=object)
+
+    data = {
+        "": np.arange(start, start + rows),
+        "patient_identifier": patient_pool[rng.integers(0, patients, rows)],
+        "sample_id": pd.array(_with_missing(rng.integers(1000, 10000, rows), rng, missing_rate), dtype="Int64"),
+        "antibiotic_code": pd.array(_with_missing(rng.integers(10000, 100000, rows), rng, missing_rate), dtype="Int64"),
+    }
+    for col, categories in CATEGORY_COLUMNS.items():
+        # The first categories are the common spellings, the rest rarer case variants.
+        weights = np.array([4.0] * (len(categories) // 2 + 1) + [1.0] * (len(categories) - len(categories) // 2 - 1))
+        choice = rng.choice(len(categories), rows, p=weights / weights.sum())
+        data[col] = _with_missing(np.array(categories, dtype=object)[choice], rng, missing_rate)
+    for col, (main_format, other_formats) in DATE_COLUMNS.items():
+        data[col] = _dates(rng, rows, main_format, other_formats, mixed_rate, missing_rate)
+    return pd.DataFrame(data, columns=COLUMNS)
+
+def write_synthetic_csv(path, rows, seed=0, piece_rows=1_000_000, **options):
+    """Write a synthetic CSV of ``rows`` rows, generated in pieces to bound memory."""
+    written = 0
+    with open(path, "w", newline="", encoding="utf-8") as out:
+        while written < rows:
+            piece = min(piece_rows, rows - written)
+            df = make_synthetic_dataset(piece, seed=seed + written, start=written, **options)
+            df.to_csv(out, index=False, header=written == 0)
+            written += piece
+    return path
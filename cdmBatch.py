@@ -0,0 +1,375 @@
+"""Headless batch entry point for the CDM transformation.
+
+Runs read_data -> load_mapping -> apply_transformations -> generate_metadata
+without Streamlit, e.g. for nightly loads:
+
+    python cdmBatch.py extract.csv column_mappings.yaml cdm_compliant_data.csv
+
+With --chunksize the input is streamed in row chunks and appended to the
+output as it goes, so memory is bounded by the chunk size. With --workers
+the rows are split into partitions transformed in parallel processes. With
+--format parquet the output is a Hive-partitioned Parquet dataset.
+
+Given a directory or a glob instead of one file, every data file in it is
+transformed with the same mapping, --jobs files at a time, each into its own
+output in the output directory, with a combined run_summary.json:
+
+    python cdmBatch.py "extracts/*.csv.gz" column_mappings.yaml cdm_out/ --jobs 8
+"""
+import argparse
+import datetime
+import glob
+import json
+import os
+import shutil
+import sys
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import pandas as pd
+
+from cdmCompression import data_extension, open_output, strip_compression_suffix
+from cdmDates import warn_date_reports
+from cdmIngest import SUPPORTED_EXTENSIONS, iter_data_chunks, read_data
+from cdmOutput import PARQUET_PARTITION_BY, PARQUET_ROW_GROUP_SIZE, write_csv, write_parquet_dataset
+from cdmParallel import transform_parallel
+from cdmPipeline import DEFAULT_MAX_IN_FLIGHT, pipelined_transform
+from cdmTransform import apply_transformations, compile_mapping, generate_metadata, load_mapping
+
+# Files transformed at the same time in a directory or glob run.
+DEFAULT_JOBS = 4
+# Combined summary of a directory or glob run, written to the output directory.
+RUN_SUMMARY_NAME = "run_summary.json"
+
+def default_metadata_path(output_path):
+    """Place the metadata JSON next to the output, e.g. out.csv(.gz) -> out_metadata.json."""
+    output_path = Path(output_path)
+    return output_path.with_name(f"{Path(strip_compression_suffix(output_path)).stem}_metadata.json")
+
+def write_metadata(cdm_df, data_path, mapping_path, metadata_path):
+    metadata = generate_metadata(cdm_df, Path(data_path).name, Path(mapping_path).name)
+    with open(metadata_path, "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=4)
+
+def print_date_reports(date_reports):
+    """Report the inferred format and parse failures for each date column."""
+    for report in date_reports.values():
+        ambiguous = ", ambiguous" if report.ambiguous else ""
+        print(
+            f"{report.column} -> {report.cdm_field}: {report.format} ({report.order}{ambiguous}); "
+            f"{report.parsed} parsed, {report.fallback} via fallback, {report.failed} failed, {report.missing} missing",
+            file=sys.stderr,
+        )
+
+@dataclass(frozen=True)
+class BatchOptions:
+    """How a batch run reads, transforms and writes its data."""
+    chunksize: int | None = None
+    workers: int = 1
+    engine: str | None = None
+    excel_engine: str | None = None
+    output_format: str = "csv"
+    partition_by: tuple = PARQUET_PARTITION_BY
+    row_group_size: int = PARQUET_ROW_GROUP_SIZE
+    pipeline: bool = False
+    max_in_flight: int = DEFAULT_MAX_IN_FLIGHT
+
+def transform_in_memory(data_path, plan, date_reports, options):
+    """Read the whole file and transform it, yielding the CDM frame."""
+    df = read_data(Path(data_path), plan, options.engine, options.excel_engine)
+    yield transform_parallel(df, plan, options.workers, date_reports=date_reports)
+
+def transform_streaming(data_path, plan, date_reports, options):
+    """Transform the file chunk by chunk, yielding each transformed chunk.
+
+    With more than one worker each chunk is split over one shared process
+    pool. With the pipeline option, chunks are instead read ahead in a thread
+    and transformed whole in the pool while earlier ones are being written.
+    """
+    chunks = iter_data_chunks(Path(data_path), options.chunksize, plan, options.engine, options.excel_engine)
+    if options.pipeline:
+        cdm_chunks = pipelined_transform(chunks, plan, date_reports, options.workers, options.max_in_flight)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=options.workers) if options.workers > 1 else None
+        cdm_chunks = (
+            transform_parallel(chunk, plan, options.workers, date_reports=date_reports, executor=executor)
+            for chunk in chunks
+        )
+    try:
+        empty = True
+        for cdm_chunk in cdm_chunks:
+            yield cdm_chunk
+            empty = False
+        if empty:
+            yield apply_transformations(pd.DataFrame(), plan)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+def _partial_path(output_path):
+    """Where an output is written until it is complete: a hidden sibling with the same suffixes."""
+    output_path = Path(output_path)
+    return output_path.with_name(f".partial-{output_path.name}")
+
+def _remove_output(output_path):
+    """Remove a CSV output or Parquet dataset directory, if there is one."""
+    output_path = Path(output_path)
+    if output_path.is_dir():
+        shutil.rmtree(output_path, ignore_errors=True)
+    elif output_path.exists():
+        output_path.unlink()
+
+def _replace_output(partial_path, output_path):
+    """Move a completed output into place, replacing an earlier output of the same name."""
+    if Path(output_path).is_dir():
+        shutil.rmtree(output_path)
+    os.replace(partial_path, output_path)
+
+def write_output(cdm_chunks, output_path, options):
+    """Write transformed chunks as one CSV or as a partitioned Parquet dataset.
+
+    Returns the first chunk (for the metadata schema) and the row count.
+    """
+    first_chunk = None
+    rows = 0
+
+    def counted():
+        nonlocal first_chunk, rows
+        for cdm_chunk in cdm_chunks:
+            if first_chunk is None:
+                first_chunk = cdm_chunk
+            rows += len(cdm_chunk)
+            yield cdm_chunk
+
+    # Written under a temporary name and moved into place once complete, so
+    # a failed run never leaves a partial output at the output path
+    partial_path = _partial_path(output_path)
+    _remove_output(partial_path)
+    try:
+        if options.output_format == "parquet":
+            write_parquet_dataset(counted(), partial_path, options.partition_by, options.row_group_size)
+        else:
+            with open_output(partial_path, member_name=strip_compression_suffix(output_path)) as out:
+                for cdm_chunk in counted():
+                    write_csv(cdm_chunk, out, header=cdm_chunk is first_chunk)
+    except BaseException:
+        _remove_output(partial_path)
+        raise
+    _replace_output(partial_path, output_path)
+    return first_chunk, rows
+
+def load_plan(mapping_path):
+    mappings = load_mapping(Path(mapping_path))
+    if not mappings:
+        raise ValueError("No valid mappings found in the YAML file.")
+    return compile_mapping(mappings)
+
+def transform_file(data_path, plan, mapping_path, output_path, metadata_path=None, options=None):
+    """Transform one data file with a compiled plan and write the output and metadata.
+
+    Returns the number of rows written and the date reports.
+    """
+    options = options or BatchOptions()
+    if options.pipeline and not options.chunksize:
+        raise ValueError("The pipeline option needs a chunk size: it overlaps reading, transforming and writing chunks.")
+    date_reports = {}
+    if options.chunksize:
+        cdm_chunks = transform_streaming(data_path, plan, date_reports, options)
+    else:
+        cdm_chunks = transform_in_memory(data_path, plan, date_reports, options)
+    cdm_df, rows = write_output(cdm_chunks, output_path, options)
+    write_metadata(cdm_df, data_path, mapping_path, metadata_path or default_metadata_path(output_path))
+    warn_date_reports(date_reports)
+    return rows, date_reports
+
+def run(data_path, mapping_path, output_path, metadata_path=None, options=None):
+    """Transform one data file with one mapping and write the output and metadata.
+
+    Returns the number of rows written.
+    """
+    rows, date_reports = transform_file(data_path, load_plan(mapping_path), mapping_path, output_path, metadata_path, options)
+    print_date_reports(date_reports)
+    return rows
+
+def is_multi_input(data):
+    """Whether ``data`` names a directory or a glob pattern rather than one file."""
+    return Path(data).is_dir() or any(char in str(data) for char in "*?[")
+
+def _is_data_file(path):
+    try:
+        return data_extension(path) in SUPPORTED_EXTENSIONS
+    except ValueError:
+        return True  # e.g. a corrupt zip archive, reported with the run's other failures
+
+def expand_inputs(data):
+    """The data files in a directory (not recursive) or matching a glob pattern, sorted."""
+    paths = Path(data).iterdir() if Path(data).is_dir() else map(Path, glob.glob(str(data), recursive=True))
+    return sorted(path for path in paths if path.is_file() and _is_data_file(path))
+
+def output_path_for(data_path, output_dir, options):
+    """Output of one file in a multi-file run, e.g. extract.csv.gz -> <output_dir>/extract_cdm.csv."""
+    stem = Path(strip_compression_suffix(data_path)).stem
+    return Path(output_dir) / (f"{stem}_cdm" if options.output_format == "parquet" else f"{stem}_cdm.csv")
+
+def _error_text(error):
+    # Input and I/O errors carry a readable message; anything else is named too.
+    return str(error) if isinstance(error, (OSError, ValueError)) else f"{type(error).__name__}: {error}"
+
+def _failed_entry(entry, error):
+    entry.update(status="failed", error=_error_text(error), rows=0, date_reports=[])
+    return entry
+
+def _transform_file_task(data_path, plan, mapping_path, output_path, options):
+    """Worker: transform one file of a multi-file run, returning its summary entry instead of raising."""
+    start = time.perf_counter()
+    entry = {"data": str(data_path), "output": str(output_path), "metadata": str(default_metadata_path(output_path))}
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        try:
+            rows, date_reports = transform_file(data_path, plan, mapping_path, output_path, options=options)
+        except Exception as e:
+            _failed_entry(entry, e)
+        else:
+            entry.update(status="ok", error=None, rows=rows, date_reports=[report.to_dict() for report in date_reports.values()])
+    entry["warnings"] = list(dict.fromkeys(str(warning.message) for warning in caught))
+    entry["seconds"] = round(time.perf_counter() - start, 3)
+    return entry
+
+def _print_entry(entry):
+    if entry["status"] == "ok":
+        print(f"{entry['data']}: {entry['rows']} rows -> {entry['output']} ({entry['seconds']:.1f} s)", file=sys.stderr)
+    else:
+        print(f"{entry['data']}: failed: {entry['error']}", file=sys.stderr)
+
+def run_many(data_paths, mapping_path, output_dir, options=None, jobs=DEFAULT_JOBS):
+    """Transform many data files with one mapping, at most ``jobs`` files at a time.
+
+    Each file gets its own output and metadata in ``output_dir``; a failing
+    file is recorded and does not stop the others. The combined run summary
+    is written to run_summary.json in ``output_dir`` and returned.
+    """
+    options = options or BatchOptions()
+    plan = load_plan(mapping_path)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    outputs = [output_path_for(data_path, output_dir, options) for data_path in data_paths]
+    if len(set(outputs)) < len(outputs):
+        raise ValueError("Several input files would be written to the same output; give them distinct names.")
+
+    started = datetime.datetime.now(datetime.timezone.utc)
+    entries = {}
+    if jobs <= 1 or len(data_paths) <= 1:
+        for data_path, output_path in zip(data_paths, outputs):
+            entries[data_path] = _transform_file_task(data_path, plan, mapping_path, output_path, options)
+            _print_entry(entries[data_path])
+    else:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(data_paths))) as executor:
+            futures = {
+                executor.submit(_transform_file_task, data_path, plan, mapping_path, output_path, options): data_path
+                for data_path, output_path in zip(data_paths, outputs)
+            }
+            for future in as_completed(futures):
+                data_path = futures[future]
+                try:
+                    entries[data_path] = future.result()
+                except Exception as e:  # the worker process itself failed
+                    output_path = output_path_for(data_path, output_dir, options)
+                    _remove_output(output_path)
+                    entries[data_path] = _failed_entry(
+                        {"data": str(data_path), "output": str(output_path), "metadata": str(default_metadata_path(output_path)), "warnings": [], "seconds": None},
+                        e,
+                    )
+                _print_entry(entries[data_path])
+
+    results = [entries[data_path] for data_path in data_paths]
+    summary = {
+        "mapping": str(mapping_path),
+        "started": started.isoformat(),
+        "finished": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "options": asdict(options),
+        "jobs": jobs,
+        "files": len(results),
+        "succeeded": sum(entry["status"] == "ok" for entry in results),
+        "failed": sum(entry["status"] != "ok" for entry in results),
+        "rows": sum(entry["rows"] for entry in results),
+        "results": results,
+    }
+    with open(output_dir / RUN_SUMMARY_NAME, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=4)
+    return summary
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Transform a data file into the CDM without a browser.")
+    parser.add_argument("data", help="Data file (CSV, Excel, JSON, JSON Lines, Parquet), or a directory or quoted glob of them")
+    parser.add_argument("mapping", help="YAML mapping file created with mapApp.py")
+    parser.add_argument("output", help="Path of the transformed CDM CSV (a .gz, .bz2, .zst or .zip suffix compresses it), "
+                        "directory of the Parquet dataset, or for several input files the output directory")
+    parser.add_argument("--metadata", help="Path of the metadata JSON (default: <output>_metadata.json)")
+    parser.add_argument("--chunksize", type=int, help="Stream the input in chunks of this many rows (CSV, Parquet, Excel)")
+    parser.add_argument("--workers", type=int, default=1, help="Number of processes to transform row partitions with (default: 1)")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="With --chunksize, read, transform (in --workers processes) and write chunks at the same time")
+    parser.add_argument("--max-in-flight", type=int, default=DEFAULT_MAX_IN_FLIGHT,
+                        help="With --pipeline, chunks read but not yet written at most (default: %(default)s)")
+    parser.add_argument("--jobs", type=int, default=DEFAULT_JOBS,
+                        help="Number of files transformed at the same time for a directory or glob (default: %(default)s)")
+    parser.add_argument("--engine", choices=["auto", "pyarrow", "c"], default="auto",
+                        help="CSV parser: Arrow's multithreaded reader (default when pyarrow is installed) or pandas' C parser")
+    parser.add_argument("--excel-engine", choices=["auto", "openpyxl", "calamine"], default="auto",
+                        help="Excel reader: openpyxl in read-only mode (default) or the native calamine reader (needs python-calamine)")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv",
+                        help="Write one CSV (default) or a Hive-partitioned Parquet dataset (needs pyarrow)")
+    parser.add_argument("--partition-by", nargs="*", default=list(PARQUET_PARTITION_BY), metavar="FIELD",
+                        help="CDM fields the Parquet dataset is partitioned by; date fields by year (default: %(default)s)")
+    parser.add_argument("--row-group-size", type=int, default=PARQUET_ROW_GROUP_SIZE,
+                        help="Rows per Parquet row group (default: %(default)s)")
+    return parser
+
+def options_from_args(args):
+    return BatchOptions(
+        chunksize=args.chunksize,
+        workers=args.workers,
+        engine=args.engine,
+        excel_engine=args.excel_engine,
+        output_format=args.format,
+        partition_by=tuple(args.partition_by),
+        row_group_size=args.row_group_size,
+        pipeline=args.pipeline,
+        max_in_flight=args.max_in_flight,
+    )
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.pipeline and not args.chunksize:
+        parser.error("--pipeline needs --chunksize")
+    warnings.simplefilter("always")
+    try:
+        if is_multi_input(args.data):
+            return main_many(args)
+        rows = run(args.data, args.mapping, args.output, args.metadata, options_from_args(args))
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    print(f"Wrote {rows} rows to {args.output}")
+    return 0
+
+def main_many(args):
+    if args.metadata:
+        raise ValueError("--metadata names one file; in a directory or glob run every output gets its own metadata.")
+    data_paths = expand_inputs(args.data)
+    if not data_paths:
+        raise ValueError(f"No data files found for {args.data}.")
+    summary = run_many(data_paths, args.mapping, args.output, options_from_args(args), args.jobs)
+    print(
+        f"Wrote {summary['rows']} rows from {summary['succeeded']} of {summary['files']} files to {args.output} "
+        f"(summary: {Path(args.output) / RUN_SUMMARY_NAME})"
+    )
+    return 1 if summary["failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
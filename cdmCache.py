@@ -0,0 +1,282 @@
+"""Content-addressed caches for the Streamlit apps.
+
+Streamlit reruns the whole script on every interaction. Parsed inputs are
+kept in a size-bounded LRU cache keyed by a hash of the file's bytes plus
+the reader options, so a rerun (or another session opening the same file)
+gets the parsed frame back instead of parsing it again. The hash of an
+upload is itself memoized per upload id, so it is computed once per file.
+
+Transformed frames and their metadata are cached the same way, keyed by the
+input's key and a hash of the canonical mapping. Entries evicted from memory
+can spill to a directory on disk (CDM_CACHE_DIR), from which a later run
+with the same file and mapping loads them instead of transforming again.
+
+Nothing in this module imports streamlit.
+"""
+import hashlib
+import json
+import os
+import pickle
+import sys
+import tempfile
+import threading
+import warnings
+from collections import OrderedDict
+from pathlib import Path
+
+import pandas as pd
+
+from cdmCompression import data_extension
+from cdmIngest import read_data
+
+# Bytes of parsed frames kept by the parse cache; CDM_PARSE_CACHE_BYTES overrides it.
+PARSE_CACHE_MAX_BYTES = int(os.environ.get("CDM_PARSE_CACHE_BYTES", 2 * 2**30))
+# Bytes of transformed frames kept in memory; CDM_TRANSFORM_CACHE_BYTES overrides it.
+TRANSFORM_CACHE_MAX_BYTES = int(os.environ.get("CDM_TRANSFORM_CACHE_BYTES", 2**30))
+# Directory that transformed frames evicted from memory spill to; no spilling when unset.
+TRANSFORM_SPILL_DIR = os.environ.get("CDM_CACHE_DIR")
+# Bytes kept in the spill directory; CDM_CACHE_DIR_BYTES overrides it.
+TRANSFORM_SPILL_MAX_BYTES = int(os.environ.get("CDM_CACHE_DIR_BYTES", 10 * 2**30))
+# Bumped when the pickled entries change shape, so old spill files are not read.
+SPILL_FORMAT = 1
+# Upload / file versions whose content hash is remembered.
+DIGEST_MEMO_SIZE = 256
+# Bytes hashed per read for file objects that cannot expose a buffer.
+HASH_BLOCK_SIZE = 2**20
+
+def frame_nbytes(df):
+    """Memory used by a DataFrame, including the contents of object columns."""
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+def value_nbytes(value):
+    """Approximate memory of a cached value: frames measured deeply, containers summed."""
+    if isinstance(value, pd.DataFrame):
+        return frame_nbytes(value)
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(value_nbytes(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(value_nbytes(item) for item in value.values())
+    return sys.getsizeof(value)
+
+class LRUCache:
+    """Thread-safe mapping that evicts the least recently used entries beyond a byte budget.
+
+    With a ``spill_dir`` evicted entries are pickled there (up to
+    ``spill_max_bytes``, oldest files removed first) and loaded back on a
+    later miss. Without one, values larger than the whole budget are returned
+    but not kept.
+    """
+
+    def __init__(self, max_bytes, sizeof=value_nbytes, spill_dir=None, spill_max_bytes=None):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.spill_dir = Path(spill_dir) if spill_dir else None
+        self.spill_max_bytes = spill_max_bytes
+        self.nbytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key][0]
+        value = self._load_spilled(key)
+        if value is None:
+            return default
+        self.put(key, value)
+        return value
+
+    def put(self, key, value, size=None):
+        size = self.sizeof(value) if size is None else size
+        evicted = []
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= self._entries.pop(key)[1]
+            if size > self.max_bytes:
+                evicted.append((key, value))
+            else:
+                self._entries[key] = (value, size)
+                self.nbytes += size
+                while self.nbytes > self.max_bytes:
+                    evicted_key, (evicted_value, evicted_size) = self._entries.popitem(last=False)
+                    self.nbytes -= evicted_size
+                    evicted.append((evicted_key, evicted_value))
+        # Written outside the lock, so other sessions are not held up by the disk.
+        for evicted_key, evicted_value in evicted:
+            self._spill(evicted_key, evicted_value)
+
+    def get_or_compute(self, key, compute):
+        """The cached value for ``key``, computing and caching it on a miss."""
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def _spill_path(self, key):
+        name = hashlib.blake2b(repr(key).encode("utf-8")).hexdigest()
+        return self.spill_dir / f"{name}.v{SPILL_FORMAT}.pkl"
+
+    def _spill(self, key, value):
+        if self.spill_dir is None:
+            return
+        path = self._spill_path(key)
+        if path.exists():
+            return
+        self.spill_dir.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=self.spill_dir, suffix=".tmp", delete=False) as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f.name, path)
+        self._trim_spill_dir()
+
+    def _load_spilled(self, key):
+        if self.spill_dir is None:
+            return None
+        path = self._spill_path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        os.utime(path)  # recently used files are removed last
+        return value
+
+    def _trim_spill_dir(self):
+        if self.spill_max_bytes is None:
+            return
+        files = sorted(self.spill_dir.glob("*.pkl"), key=lambda path: path.stat().st_mtime)
+        total = sum(path.stat().st_size for path in files)
+        for path in files:
+            if total <= self.spill_max_bytes:
+                break
+            total -= path.stat().st_size
+            path.unlink(missing_ok=True)
+
+_digests = OrderedDict()
+_digests_lock = threading.Lock()
+
+def _digest_memo_key(source):
+    """What identifies one version of a file: the upload id, or path, size and mtime."""
+    file_id = getattr(source, "file_id", None)
+    if file_id is not None:
+        return ("upload", file_id)
+    if isinstance(source, (str, os.PathLike)):
+        stat = os.stat(source)
+        return ("path", str(Path(source).resolve()), stat.st_size, stat.st_mtime_ns)
+    return None
+
+def _hash_source(source):
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            return hashlib.file_digest(f, "blake2b").hexdigest()
+    if hasattr(source, "getbuffer"):
+        # In-memory uploads are hashed without copying their bytes.
+        with source.getbuffer() as buffer:
+            return hashlib.blake2b(buffer).hexdigest()
+    source.seek(0)
+    digest = hashlib.blake2b()
+    while block := source.read(HASH_BLOCK_SIZE):
+        digest.update(block)
+    source.seek(0)
+    return digest.hexdigest()
+
+def source_digest(source):
+    """Content hash of a path or upload, computed once per upload id or file version."""
+    memo_key = _digest_memo_key(source)
+    with _digests_lock:
+        if memo_key in _digests:
+            _digests.move_to_end(memo_key)
+            return _digests[memo_key]
+    digest = _hash_source(source)
+    if memo_key is not None:
+        with _digests_lock:
+            _digests[memo_key] = digest
+            while len(_digests) > DIGEST_MEMO_SIZE:
+                _digests.popitem(last=False)
+    return digest
+
+def plan_read_key(plan):
+    """The part of a TransformPlan that affects reading: which columns, typed as what."""
+    if plan is None:
+        return None
+    return tuple(sorted((rule.source, rule.data_type) for rule in plan.rules if rule.source is not None))
+
+def plan_digest(plan):
+    """Hash of a compiled mapping's canonical form.
+
+    Built from the compiled rules, so YAML layout, key order and comments do
+    not change it.
+    """
+    canonical = [
+        [rule.cdm_field, rule.data_type, rule.source, sorted((repr(k), repr(v)) for k, v in (rule.value_mapping or {}).items())]
+        for rule in plan.rules
+    ]
+    return hashlib.blake2b(json.dumps(canonical).encode("utf-8")).hexdigest()
+
+PARSE_CACHE = LRUCache(PARSE_CACHE_MAX_BYTES)
+TRANSFORM_CACHE = LRUCache(TRANSFORM_CACHE_MAX_BYTES, spill_dir=TRANSFORM_SPILL_DIR, spill_max_bytes=TRANSFORM_SPILL_MAX_BYTES)
+
+def read_key(source, reader_key):
+    """Cache key of a parsed input: content hash, data format and reader options."""
+    return (source_digest(source), data_extension(source)) + tuple(reader_key)
+
+def data_read_key(source, plan=None, engine=None, excel_engine=None):
+    """The read_key cached_read_data uses, e.g. to key what is computed from its frame."""
+    return read_key(source, ("read_data", plan_read_key(plan), engine, excel_engine))
+
+def _with_warnings(compute):
+    """Run ``compute`` and return its result with the messages of the warnings it raised."""
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        result = compute()
+    return result, [str(warning.message) for warning in caught]
+
+def _cached_with_warnings(cache, key, compute):
+    """``compute()`` cached under ``key``; its warnings are kept and raised again on a hit."""
+    result, messages = cache.get_or_compute(key, lambda: _with_warnings(compute))
+    for message in messages:
+        warnings.warn(message)
+    return result
+
+def cached_read(source, reader_key, read, cache=PARSE_CACHE):
+    """``read()`` cached under the content hash of ``source`` plus ``reader_key``.
+
+    Warnings raised while reading are kept with the frame and raised again on
+    a cache hit. The returned frame is shared and must not be modified.
+    """
+    return _cached_with_warnings(cache, read_key(source, reader_key), read)
+
+def cached_read_data(source, plan=None, engine=None, excel_engine=None, cache=PARSE_CACHE):
+    """cdmIngest.read_data, cached by content hash and reader options."""
+    if source is None:
+        return None
+    return _cached_with_warnings(
+        cache,
+        data_read_key(source, plan, engine, excel_engine),
+        lambda: read_data(source, plan, engine, excel_engine),
+    )
+
+def cached_transform(data_key, plan, transform, cache=TRANSFORM_CACHE):
+    """``transform()`` (returning the CDM frame and date reports) cached by input key and mapping hash.
+
+    Warnings are kept and raised again on a hit; the result is shared and
+    must not be modified.
+    """
+    return _cached_with_warnings(cache, ("transform", data_key, plan_digest(plan)), transform)
+
+def cached_metadata(data_key, plan, data_filename, mapping_filename, generate, cache=TRANSFORM_CACHE):
+    """``generate()`` (the FAIR metadata of a transformed input) cached like cached_transform."""
+    return cache.get_or_compute(("metadata", data_key, plan_digest(plan), data_filename, mapping_filename), generate)
@@ -0,0 +1,260 @@
+"""Transparent decompression of inputs and compression of outputs.
+
+Compression is recognised by the file suffix (.gz, .bz2, .zst, .zip) or, for
+files without such a suffix, by the magic bytes at the start of the file.
+Inputs are decompressed as a stream, so the chunked readers never hold more
+than a chunk of the decompressed data; the format is then picked from the
+name of the data inside (extract.csv.gz -> extract.csv).
+"""
+import bz2
+import gzip
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+import zlib
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional; .zst files then cannot be read or written
+    zstandard = None
+
+COMPRESSION_SUFFIXES = {".gz": "gzip", ".gzip": "gzip", ".bz2": "bz2", ".zst": "zstd", ".zip": "zip"}
+MAGIC_BYTES = {b"\x1f\x8b": "gzip", b"BZh": "bz2", b"\x28\xb5\x2f\xfd": "zstd", b"PK\x03\x04": "zip"}
+# Formats that are zip archives themselves (.xlsx) or need random access;
+# compressed copies of these are decompressed to a temporary file first.
+RANDOM_ACCESS_EXTENSIONS = [".xls", ".xlsx", ".parquet"]
+# Bytes decompressed per read.
+STREAM_BUFFER_SIZE = 2**20
+
+def _is_path(source):
+    return isinstance(source, (str, os.PathLike))
+
+def _name(source):
+    return getattr(source, "name", None) or str(source)
+
+def strip_compression_suffix(name):
+    """The file name without a compression suffix, e.g. extract.csv.gz -> extract.csv."""
+    path = Path(name)
+    return path.stem if path.suffix.lower() in COMPRESSION_SUFFIXES else path.name
+
+def data_extension(source):
+    """The extension of the data format of a path, upload or file name, looking through a compression suffix.
+
+    A zip archive named without the data's own suffix (extract.zip) takes it
+    from the file inside, so for paths and uploads the archive is opened.
+    """
+    name = _name(source)
+    extension = Path(strip_compression_suffix(name)).suffix.lower()
+    if extension or Path(name).suffix.lower() != ".zip":
+        return extension
+    if _is_path(source) and not os.path.isfile(source):
+        return extension  # a bare file name: nothing to look into
+    return Path(zip_member_name(source)).suffix.lower()
+
+def _magic(source):
+    if _is_path(source):
+        with open(source, "rb") as f:
+            return f.read(4)
+    source.seek(0)
+    head = source.read(4)
+    source.seek(0)
+    return head
+
+def detect_compression(source):
+    """'gzip', 'bz2', 'zstd' or 'zip' for a compressed path or upload, else None."""
+    name = _name(source)
+    compression = COMPRESSION_SUFFIXES.get(Path(name).suffix.lower())
+    if compression is not None or Path(name).suffix.lower() in RANDOM_ACCESS_EXTENSIONS:
+        return compression
+    head = _magic(source)
+    return next((compression for magic, compression in MAGIC_BYTES.items() if head.startswith(magic)), None)
+
+def _require_zstd():
+    if zstandard is None:
+        raise ValueError("Zstandard (.zst) files need the zstandard package.")
+
+def _zip_member(archive):
+    """The one data file in a zip archive."""
+    members = [
+        info.filename for info in archive.infolist()
+        if not info.is_dir() and not info.filename.startswith("__MACOSX/")
+    ]
+    if len(members) != 1:
+        raise ValueError(f"A zip archive must contain exactly one data file, found {len(members)}.")
+    return members[0]
+
+def _open_zip(file, source):
+    try:
+        return zipfile.ZipFile(file)
+    except zipfile.BadZipFile as e:
+        raise ValueError(f"Corrupt zip archive {_name(source)}: {e}") from e
+
+def zip_member_name(source):
+    """The name of the one data file in a zip archive, given as a path or upload."""
+    if _is_path(source):
+        with _open_zip(source, source) as archive:
+            return _zip_member(archive)
+    source.seek(0)
+    try:
+        with _open_zip(source, source) as archive:
+            return _zip_member(archive)
+    finally:
+        source.seek(0)
+
+# What the decompressors raise on data that is corrupt or cut off.
+CORRUPT_DATA_ERRORS = (EOFError, OSError, zlib.error, zipfile.BadZipFile) + ((zstandard.ZstdError,) if zstandard else ())
+
+class DecompressedFile(io.RawIOBase):
+    """Raw read-only stream over the decompressed content of a path or upload.
+
+    ``name`` is the name of the data inside (without the compression suffix,
+    or the zip member), so readers can pick the format from it. Seeking back
+    to the start reopens the decompressor; other seeks are not supported.
+    """
+
+    def __init__(self, source, compression):
+        self.source = source
+        self.compression = compression
+        self._file = None
+        self._archive = None
+        self._stream = None
+        self._position = 0
+        self._open()
+        if compression == "zip":
+            self.name = Path(self._member).name
+        else:
+            self.name = strip_compression_suffix(_name(source))
+
+    def _open(self):
+        if _is_path(self.source):
+            self._file = open(self.source, "rb")
+        else:
+            self._file = self.source
+            self._file.seek(0)
+        if self.compression == "gzip":
+            self._stream = gzip.GzipFile(fileobj=self._file, mode="rb")
+        elif self.compression == "bz2":
+            self._stream = bz2.BZ2File(self._file, "rb")
+        elif self.compression == "zstd":
+            _require_zstd()
+            self._stream = zstandard.ZstdDecompressor().stream_reader(self._file)
+        elif self.compression == "zip":
+            self._archive = _open_zip(self._file, self.source)
+            self._member = _zip_member(self._archive)
+            self._stream = self._archive.open(self._member)
+        else:
+            raise ValueError(f"Unknown compression '{self.compression}'.")
+        self._position = 0
+
+    def _close_streams(self):
+        for handle in (self._stream, self._archive):
+            if handle is not None:
+                handle.close()
+        if _is_path(self.source) and self._file is not None:
+            self._file.close()
+        self._stream = self._archive = self._file = None
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        # Only rewinding is supported, which is all the readers need.
+        return True
+
+    def readinto(self, buffer):
+        try:
+            count = self._stream.readinto(buffer)
+        except CORRUPT_DATA_ERRORS as e:
+            raise ValueError(f"Corrupt or truncated {self.compression} data in {_name(self.source)}: {e}") from e
+        self._position += count
+        return count
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence != io.SEEK_SET:
+            raise io.UnsupportedOperation("Decompressed streams can only seek back to the start.")
+        if offset == 0:
+            self._close_streams()
+            self._open()
+        elif offset != self._position:
+            raise io.UnsupportedOperation("Decompressed streams can only seek back to the start.")
+        return self._position
+
+    def close(self):
+        if not self.closed:
+            self._close_streams()
+        super().close()
+
+def open_decompressed(source, compression):
+    """A buffered binary stream of the decompressed content, named after the data inside."""
+    return io.BufferedReader(DecompressedFile(source, compression), STREAM_BUFFER_SIZE)
+
+@contextmanager
+def decompressed(source):
+    """The source itself, or a stream of its decompressed content when it is compressed.
+
+    Compressed Excel and Parquet files are decompressed into a temporary file,
+    whose path is yielded instead, as their readers need random access.
+    """
+    compression = detect_compression(source)
+    if compression is None:
+        yield source
+        return
+    with open_decompressed(source, compression) as stream:
+        if Path(stream.name).suffix.lower() not in RANDOM_ACCESS_EXTENSIONS:
+            yield stream
+            return
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / stream.name
+            with open(path, "wb") as f:
+                shutil.copyfileobj(stream, f, STREAM_BUFFER_SIZE)
+            yield path
+
+def _compressor(raw, compression, member_name, stack):
+    if compression is None:
+        return raw
+    if compression == "gzip":
+        return stack.enter_context(gzip.GzipFile(fileobj=raw, mode="wb"))
+    if compression == "bz2":
+        return stack.enter_context(bz2.BZ2File(raw, "wb"))
+    if compression == "zstd":
+        _require_zstd()
+        return stack.enter_context(zstandard.ZstdCompressor().stream_writer(raw, closefd=False))
+    if compression == "zip":
+        archive = stack.enter_context(zipfile.ZipFile(raw, "w", zipfile.ZIP_DEFLATED))
+        return stack.enter_context(archive.open(member_name, "w", force_zip64=True))
+    raise ValueError(f"Unknown compression '{compression}'. Use 'gzip', 'bz2', 'zstd' or 'zip'.")
+
+@contextmanager
+def open_output(target, compression=None, member_name=None):
+    """Open a path or binary buffer for writing UTF-8 text, compressed on the fly.
+
+    For a path the compression follows its suffix unless given. A zip archive
+    gets one member, by default named after the target without .zip.
+    """
+    owns_file = _is_path(target)
+    if owns_file:
+        compression = compression or COMPRESSION_SUFFIXES.get(Path(target).suffix.lower())
+        member_name = member_name or strip_compression_suffix(target)
+        raw = open(target, "wb")
+    else:
+        raw = target
+    try:
+        with ExitStack() as stack:
+            text = io.TextIOWrapper(_compressor(raw, compression, member_name or "data", stack), encoding="utf-8", newline="")
+            try:
+                yield text
+            finally:
+                text.flush()
+                text.detach()
+    finally:
+        if owns_file:
+            raw.close()
@@ -0,0 +1,229 @@
+"""Format-inferring, vectorized date parsing for CDM date fields.
+
+Each source column gets one explicit strptime format, inferred from a sample
+of its values, so pandas can parse it vectorized instead of element by
+element. Rows that do not match fall back through DATE_FORMAT_CASCADE and,
+last, per-value inference; the decision and failure counts are kept in a
+DateColumnReport per column.
+"""
+import warnings
+from dataclasses import asdict, dataclass
+
+import numpy as np
+import pandas as pd
+
+# Formats tried, in order, both for inference and as fallback for failing rows.
+# Where a sample fits a day-first and a month-first format equally well, the
+# earlier (day-first) one wins. "ISO8601" also takes fractional seconds and
+# UTC offsets; the offset is dropped, keeping the local wall-clock time.
+DATE_FORMAT_CASCADE = (
+    ("%Y-%m-%d", "year-first"),
+    ("%Y-%m-%d %H:%M:%S", "year-first"),
+    ("%Y-%m-%d %H:%M", "year-first"),
+    ("%Y-%m-%dT%H:%M:%S", "year-first"),
+    ("%Y/%m/%d", "year-first"),
+    ("%d/%m/%Y", "day-first"),
+    ("%m/%d/%Y", "month-first"),
+    ("%d-%m-%Y", "day-first"),
+    ("%m-%d-%Y", "month-first"),
+    ("%d.%m.%Y", "day-first"),
+    ("%d/%m/%Y %H:%M", "day-first"),
+    ("%m/%d/%Y %H:%M", "month-first"),
+    ("%Y%m%d", "year-first"),
+    ("ISO8601", "year-first"),
+    ("%d %b %Y", "month-name"),
+    ("%d %B %Y", "month-name"),
+    ("%d-%b-%Y", "month-name"),
+    ("%b %d, %Y", "month-name"),
+    ("%B %d, %Y", "month-name"),
+)
+
+# pandas format that infers each value on its own; the cascade's last resort.
+MIXED_FORMAT = "mixed"
+# A UTC offset at the end of a timestamp, e.g. Z, +02:00 or -0500.
+UTC_OFFSET_PATTERN = r"(?:Z|[+-]\d{2}:?\d{2})$"
+# Once a column's order is decided, formats of the opposite order are not tried.
+OPPOSITE_ORDER = {"day-first": "month-first", "month-first": "day-first"}
+
+# Number of non-null values looked at when inferring a column's format.
+DATE_SAMPLE_SIZE = 1000
+
+@dataclass
+class DateColumnReport:
+    """Format decision and parse counts for one source date column."""
+    column: str
+    cdm_field: str
+    format: str | None = None
+    order: str = "unknown"
+    ambiguous: bool = False
+    rows: int = 0
+    missing: int = 0
+    parsed: int = 0
+    fallback: int = 0
+    failed: int = 0
+    wrong_order: int = 0  # failed rows that only fit the opposite day/month order
+
+    def to_dict(self):
+        return asdict(self)
+
+    def add_counts(self, other):
+        """Add the row counts of another report for the same column."""
+        for name in ("rows", "missing", "parsed", "fallback", "failed", "wrong_order"):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+    def without_counts(self):
+        """A copy with the same format decision and all counts at zero."""
+        return DateColumnReport(self.column, self.cdm_field, self.format, self.order, self.ambiguous)
+
+def _to_datetime(values, date_format, dayfirst=False):
+    """Parse strings with one format (or "mixed"), as naive datetime64[ns]; failures become NaT.
+
+    A UTC offset is dropped rather than converted, so the date stays the
+    local calendar date, and offsets may differ between rows.
+    """
+    if date_format in ("ISO8601", MIXED_FORMAT):
+        values = values.str.replace(UTC_OFFSET_PATTERN, "", regex=True)
+    return pd.to_datetime(values, format=date_format, dayfirst=dayfirst, errors="coerce").astype("datetime64[ns]")
+
+def infer_date_format(sample):
+    """Pick the cascade format that parses most of ``sample``.
+
+    Returns (format, order, ambiguous); ambiguous is True when a format with
+    the opposite day/month order parsed the sample equally well.
+    """
+    scores = []
+    for date_format, order in DATE_FORMAT_CASCADE:
+        parsed = _to_datetime(sample, date_format)
+        scores.append((int(parsed.notna().sum()), date_format, order))
+    best_count, best_format, best_order = max(scores, key=lambda score: score[0])
+    if best_count == 0:
+        return None, "unknown", False
+    opposite = OPPOSITE_ORDER.get(best_order)
+    ambiguous = any(count == best_count and order == opposite for count, _, order in scores)
+    return best_format, best_order, ambiguous
+
+def _distinct_strings(uniques):
+    """The distinct values of a column as stripped strings, in order of appearance."""
+    return pd.Series(np.asarray(uniques, dtype=object)).astype(str).str.strip()
+
+def prime_report(col_data, report):
+    """Infer and pin a column's format without parsing it.
+
+    Used before a column is split into partitions, so that every partition
+    parses with the decision a single pass over the whole column would make.
+    """
+    if report.format is not None:
+        return
+    if pd.api.types.is_datetime64_any_dtype(col_data):
+        report.format = "datetime64"
+        return
+    values = _distinct_strings(pd.unique(col_data.dropna()))
+    if len(values):
+        report.format, report.order, report.ambiguous = infer_date_format(values.iloc[:DATE_SAMPLE_SIZE])
+
+def _fits_order(values, order):
+    """Whether each value parses with some cascade format of the given day/month order."""
+    fits = pd.Series(False, index=values.index)
+    for date_format, format_order in DATE_FORMAT_CASCADE:
+        if format_order == order:
+            fits |= _to_datetime(values, date_format).notna()
+    return fits
+
+def _parse_unique(col_data, report):
+    """Parse each distinct value of a column once.
+
+    Returns (codes, parsed): ``codes`` are the factorized codes of the column
+    (-1 for missing) and ``parsed`` the datetime64 array of its distinct
+    values. Counts in the report are weighted by how often each value occurs.
+    """
+    codes, uniques = pd.factorize(col_data)
+    weights = np.bincount(codes[codes >= 0], minlength=len(uniques))
+    report.rows += len(codes)
+    report.missing += int((codes < 0).sum())
+
+    if pd.api.types.is_datetime64_any_dtype(uniques.dtype):
+        report.format = report.format or "datetime64"
+        report.parsed += int(weights.sum())
+        return codes, np.asarray(uniques, dtype="datetime64[ns]")
+
+    values = _distinct_strings(uniques)
+    if report.format is None and len(values):
+        report.format, report.order, report.ambiguous = infer_date_format(values.iloc[:DATE_SAMPLE_SIZE])
+
+    if report.format is None or report.format == "datetime64":
+        parsed = pd.Series(pd.NaT, index=values.index, dtype="datetime64[ns]")
+    else:
+        parsed = _to_datetime(values, report.format)
+    report.parsed += int(weights[parsed.notna().to_numpy()].sum())
+
+    failed = parsed.isna()
+    opposite = OPPOSITE_ORDER.get(report.order)
+    for date_format, order in DATE_FORMAT_CASCADE:
+        if not failed.any():
+            break
+        if date_format == report.format or order == opposite:
+            continue
+        retry = _to_datetime(values[failed], date_format).dropna()
+        if len(retry):
+            parsed.loc[retry.index] = retry
+            report.fallback += int(weights[retry.index].sum())
+            failed = parsed.isna()
+    inferable = failed
+    if failed.any() and opposite is not None:
+        # Values that only fit the opposite order stay unparsed rather than
+        # mixing both orders in one column
+        wrong_order = _fits_order(values[failed], opposite)
+        report.wrong_order += int(weights[wrong_order[wrong_order].index].sum())
+        inferable = failed & ~wrong_order.reindex(failed.index, fill_value=False)
+    if inferable.any():
+        # Last resort: infer each remaining value on its own, in the column's day/month order
+        retry = _to_datetime(values[inferable], MIXED_FORMAT, dayfirst=report.order == "day-first").dropna()
+        if len(retry):
+            parsed.loc[retry.index] = retry
+            report.fallback += int(weights[retry.index].sum())
+            failed = parsed.isna()
+    report.failed += int(weights[failed.to_numpy()].sum())
+
+    return codes, parsed.to_numpy(dtype="datetime64[ns]")
+
+def warn_date_reports(date_reports):
+    """Warn once per date column whose day/month order was a guess or that has rows left empty."""
+    for report in date_reports.values():
+        if report.ambiguous:
+            warnings.warn(
+                f"Dates in column '{report.column}' fit both day-first and month-first; "
+                f"they were read as {report.order} ({report.format})."
+            )
+        if report.failed:
+            wrong_order = f", {report.wrong_order} of them only fit {OPPOSITE_ORDER[report.order]}" if report.wrong_order else ""
+            warnings.warn(
+                f"{report.failed} of {report.rows} values in date column '{report.column}' "
+                f"could not be parsed{wrong_order}, and were left empty in '{report.cdm_field}'."
+            )
+
+def _broadcast(codes, unique_values, fill_value):
+    """Map per-distinct-value results back onto the rows through their codes."""
+    lookup = np.append(unique_values, np.array([fill_value], dtype=unique_values.dtype))
+    return lookup[codes]
+
+def parse_dates(col_data, report):
+    """Parse a source column into datetime64 using the column's report.
+
+    Infers the format on first use (and pins it in the report for later
+    chunks), then parses the distinct values vectorized with that format and
+    retries only the failing ones with the other cascade formats. Counts are
+    added to the report.
+    """
+    codes, parsed = _parse_unique(col_data, report)
+    result = _broadcast(codes, parsed, np.datetime64("NaT"))
+    return pd.Series(result, index=col_data.index, name=col_data.name)
+
+def format_datetimes(col_data, date_format):
+    """Format a datetime64 column as strings, formatting each distinct value once.
+
+    Missing values become NaN.
+    """
+    codes, uniques = pd.factorize(col_data)
+    formatted = np.asarray(pd.DatetimeIndex(uniques).strftime(date_format), dtype=object)
+    result = _broadcast(codes, formatted, np.nan)
+    return pd.Series(result, index=col_data.index, name=col_data.name)
@@ -0,0 +1,616 @@
+"""Readers that turn uploaded or server-local files into DataFrames.
+
+Nothing in this module imports streamlit, so it can be used headless.
+
+CSV goes through Arrow's multithreaded reader when pyarrow is installed,
+with Arrow-backed dtypes. Given a compiled TransformPlan, readers parse only
+the source columns the mapping references (usecols for CSV, column
+selection for Parquet and Excel), and the dtype of each of them follows the
+target CDM data_type: dictionary-encoded strings for categorical fields and
+plain strings for everything else. Number fields are read as text and then
+normalized value by value (number_text), as they may hold codes.
+"""
+import io
+import json
+import os
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+import pandas as pd
+
+from cdmCompression import COMPRESSION_SUFFIXES, data_extension, decompressed
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:  # pyarrow is optional; CSV then goes through pandas' C parser
+    pa = None
+
+try:
+    import ijson
+except ImportError:  # ijson is optional; JSON arrays are then streamed with the json module
+    ijson = None
+
+try:
+    import python_calamine
+except ImportError:  # python-calamine is optional; Excel then goes through openpyxl
+    python_calamine = None
+
+SUPPORTED_EXTENSIONS = ['.csv', '.xls', '.xlsx', '.json', '.jsonl', '.ndjson', '.parquet']
+JSON_LINES_EXTENSIONS = ['.jsonl', '.ndjson']
+# File types the apps' upload widgets accept.
+UPLOAD_TYPES = [ext.lstrip('.') for ext in SUPPORTED_EXTENSIONS + list(COMPRESSION_SUFFIXES)]
+
+# Bytes per block for Arrow's streaming CSV reader.
+ARROW_BLOCK_SIZE = 16 * 2**20
+# Bytes read to find a CSV's column names.
+HEADER_BLOCK_SIZE = 2**20
+# Server-local files (paths rather than uploads) are memory-mapped, so the
+# parser reads straight from the page cache without an in-memory copy.
+MEMORY_MAP_LOCAL_FILES = True
+# Characters read at a time when streaming a top-level JSON array.
+JSON_BLOCK_SIZE = 2**20
+# Rows shown when previewing an Excel sheet before it is loaded.
+EXCEL_PREVIEW_ROWS = 10
+
+def source_name(source):
+    """Return the file name of a path or an uploaded file object."""
+    return getattr(source, "name", None) or str(source)
+
+def resolve_engine(engine=None):
+    """Pick the CSV engine: 'pyarrow' when installed (or requested), else pandas' 'c'."""
+    if engine in (None, "auto"):
+        return "pyarrow" if pa is not None else "c"
+    if engine == "pyarrow" and pa is None:
+        raise ValueError("The pyarrow CSV engine needs the pyarrow package.")
+    if engine not in ("pyarrow", "c"):
+        raise ValueError(f"Unknown CSV engine '{engine}'. Use 'auto', 'pyarrow' or 'c'.")
+    return engine
+
+def dtype_hints(plan, engine):
+    """Dtype per mapped source column, derived from the target CDM data_type.
+
+    Categorical fields are dictionary encoded; everything else, number fields
+    included, is read as text.
+    """
+    if plan is None:
+        return {}
+    if engine == "pyarrow":
+        types = {"categorical": pa.dictionary(pa.int32(), pa.string()), "other": pa.string()}
+    else:
+        types = {"categorical": "category", "other": "string"}
+    return {
+        rule.source: types["categorical" if rule.data_type == "categorical" else "other"]
+        for rule in plan.rules
+        if rule.source is not None
+    }
+
+def number_text(values):
+    """The values of a number field as text, normalized value by value.
+
+    Whole numbers are written without a decimal part (5421, 5421.0 and "05421"
+    all become "5421"), other numbers keep their text and values that are not
+    numbers, such as ATC codes, are kept as they are. A value's result does
+    not depend on the rest of the column, so every reader and every chunk of
+    a file gives a number field the same dtype and the same values.
+    """
+    text = values.astype("string")
+    # Only values that are not already plain integers need parsing.
+    rest = text[~text.str.fullmatch(r"-?(?:0|[1-9]\d*)").fillna(True)]
+    if rest.empty:
+        return text
+    numbers = pd.to_numeric(rest, errors="coerce")
+    whole = (numbers.notna() & (numbers.abs() < 2**53) & (numbers % 1 == 0)).fillna(False)
+    if whole.any():
+        text = text.copy()
+        text.loc[whole[whole].index] = numbers[whole].astype("int64").astype("string")
+    return text
+
+def convert_number_fields(df, plan):
+    """Apply number_text to the number fields of a frame read with a plan."""
+    if plan is None:
+        return df
+    for rule in plan.rules:
+        if rule.data_type == "number" and rule.source in df.columns:
+            df[rule.source] = number_text(df[rule.source])
+    return df
+
+def resolve_excel_engine(engine=None):
+    """Pick the Excel engine: 'openpyxl' (streams rows read-only) unless the native 'calamine' is requested."""
+    if engine in (None, "auto"):
+        return "openpyxl"
+    if engine == "calamine" and python_calamine is None:
+        raise ValueError("The calamine Excel engine needs the python-calamine package.")
+    if engine not in ("openpyxl", "calamine"):
+        raise ValueError(f"Unknown Excel engine '{engine}'. Use 'auto', 'openpyxl' or 'calamine'.")
+    return engine
+
+def _rewind(source):
+    if hasattr(source, "seek"):
+        source.seek(0)
+
+def is_local_path(source):
+    return isinstance(source, (str, os.PathLike))
+
+def local_data_root():
+    """The directory server-local paths may be read from, or None when the apps accept uploads only.
+
+    Set with the CDM_LOCAL_DATA_ROOT environment variable; unset, reading
+    local paths is disabled.
+    """
+    root = os.environ.get("CDM_LOCAL_DATA_ROOT")
+    return Path(root).expanduser().resolve() if root else None
+
+def resolve_local_path(path_text):
+    """Validate a server-local data path entered in one of the apps.
+
+    The file must lie inside local_data_root(); relative paths are taken
+    from there. Missing files and files outside it get the same error, so
+    the message does not reveal what exists elsewhere on the server.
+    """
+    root = local_data_root()
+    if root is None:
+        raise ValueError("Reading files from the server is disabled; set CDM_LOCAL_DATA_ROOT to enable it.")
+    path = (root / Path(path_text).expanduser()).resolve()
+    if not path.is_relative_to(root) or not path.is_file():
+        raise ValueError(f"No data file '{path_text}' in the server's data directory.")
+    if data_extension(path) not in SUPPORTED_EXTENSIONS:
+        raise ValueError("Unsupported file type. Supported: " + ", ".join(SUPPORTED_EXTENSIONS) + ", optionally compressed as " + ", ".join(COMPRESSION_SUFFIXES))
+    return path
+
+@contextmanager
+def _arrow_input(source):
+    """Arrow input for a source: local files are memory-mapped, uploads are used as they are."""
+    if is_local_path(source) and MEMORY_MAP_LOCAL_FILES:
+        with pa.memory_map(os.fspath(source), "r") as mapped:
+            yield mapped
+    elif is_local_path(source):
+        yield os.fspath(source)
+    else:
+        yield source
+
+def _pandas_input_options(source):
+    """Let pandas' C parser memory-map local files instead of reading them into a buffer."""
+    return {"memory_map": True} if is_local_path(source) and MEMORY_MAP_LOCAL_FILES else {}
+
+def _arrow_types_mapper(arrow_type):
+    # Dictionary columns become pandas Categoricals; everything else stays Arrow-backed.
+    return None if pa.types.is_dictionary(arrow_type) else pd.ArrowDtype(arrow_type)
+
+def _arrow_to_frame(table, start=0):
+    df = table.to_pandas(types_mapper=_arrow_types_mapper)
+    df.index = pd.RangeIndex(start, start + len(df))
+    return df
+
+def projected_columns(names, plan):
+    """The columns of ``names`` to read: all without a plan, else only those the mapping references.
+
+    When none of the referenced columns exist, the first column is still read
+    so the row count is known.
+    """
+    if plan is None:
+        return list(names)
+    referenced = set(plan.source_columns)
+    return [name for name in names if name in referenced] or list(names[:1])
+
+def _arrow_parse_options():
+    # Quoted values may span lines, as pandas' parser allows.
+    return pa_csv.ParseOptions(newlines_in_values=True)
+
+def _csv_header(source, engine):
+    """Column names of a CSV as pandas names them, without parsing the data."""
+    if engine == "pyarrow":
+        with _arrow_input(source) as data, pa_csv.open_csv(
+            data, read_options=pa_csv.ReadOptions(block_size=HEADER_BLOCK_SIZE), parse_options=_arrow_parse_options()
+        ) as probe:
+            names = probe.schema.names
+        # Match pandas' naming of headerless columns, e.g. a written index column
+        names = [name or f"Unnamed: {i}" for i, name in enumerate(names)]
+    else:
+        names = list(pd.read_csv(source, nrows=0, **_pandas_input_options(source)).columns)
+    _rewind(source)
+    return names
+
+def _arrow_csv_options(source, plan, streaming=False):
+    """Read, parse and convert options for Arrow that project and type the mapped columns.
+
+    Columns without a hint are inferred from the data, except when streaming:
+    Arrow's streaming reader infers types from the first block only, so later
+    blocks could fail, and those columns are pinned to string instead.
+    """
+    names = _csv_header(source, "pyarrow")
+    hints = dtype_hints(plan, "pyarrow")
+    columns = projected_columns(names, plan)
+    if streaming:
+        column_types = {name: hints.get(name, pa.string()) for name in columns}
+        read_options = pa_csv.ReadOptions(column_names=names, skip_rows=1, block_size=ARROW_BLOCK_SIZE)
+    else:
+        column_types = {name: hints[name] for name in columns if name in hints}
+        read_options = pa_csv.ReadOptions(column_names=names, skip_rows=1)
+    convert_options = pa_csv.ConvertOptions(
+        column_types=column_types,
+        include_columns=columns,
+        strings_can_be_null=True,
+    )
+    return read_options, _arrow_parse_options(), convert_options
+
+def _pandas_csv_options(source, plan):
+    """usecols and dtype arguments for pandas.read_csv that project and type the mapped columns."""
+    if plan is None:
+        return {}
+    return {
+        "usecols": projected_columns(_csv_header(source, "c"), plan),
+        "dtype": dtype_hints(plan, "c"),
+    }
+
+def read_csv(source, plan=None, engine=None):
+    """Read a whole CSV, typing the mapped columns from the plan.
+
+    With a plan only the source columns the mapping references are parsed.
+    """
+    engine = resolve_engine(engine)
+    if engine == "pyarrow":
+        read_options, parse_options, convert_options = _arrow_csv_options(source, plan)
+        with _arrow_input(source) as data:
+            table = pa_csv.read_csv(data, read_options=read_options, parse_options=parse_options, convert_options=convert_options)
+        df = _arrow_to_frame(table)
+    else:
+        df = pd.read_csv(source, **_pandas_input_options(source), **_pandas_csv_options(source, plan))
+    return convert_number_fields(df, plan)
+
+def read_parquet(source, plan=None):
+    """Read a Parquet file, selecting only the columns the mapping references."""
+    options = _pandas_input_options(source)
+    if plan is None:
+        return pd.read_parquet(source, **options)
+    import pyarrow.parquet as pq
+    names = pq.ParquetFile(source, **options).schema_arrow.names
+    _rewind(source)
+    return convert_number_fields(pd.read_parquet(source, columns=projected_columns(names, plan), **options), plan)
+
+def read_excel(source, plan=None, excel_engine=None, **options):
+    """Read an Excel sheet, parsing only the columns the mapping references.
+
+    As for CSV, the first column is still read when none of them exist, so
+    the row count is known. With a plan, cells keep their Excel types (text
+    such as "00123" is not parsed as a number), as in iter_excel_chunks.
+    """
+    if isinstance(source, pd.ExcelFile):
+        opened = nullcontext(source)
+    else:
+        opened = pd.ExcelFile(source, engine="calamine" if resolve_excel_engine(excel_engine) == "calamine" else None)
+    with opened as workbook:
+        if plan is not None:
+            header = workbook.parse(options.get("sheet_name", 0), nrows=0).columns
+            options["usecols"] = projected_columns(list(header), plan)
+            options["dtype"] = object
+        df = workbook.parse(**options)
+    if plan is not None:
+        df = df.infer_objects()
+    return convert_number_fields(df, plan)
+
+def open_workbook(source):
+    """Open an Excel workbook once, for listing, previewing and loading its sheets.
+
+    .xlsx workbooks are opened read-only, so the sheet names come from the
+    workbook metadata and no cell data is parsed until a sheet is read. The
+    handle can be passed to read_excel in place of the file.
+    """
+    _rewind(source)
+    return pd.ExcelFile(source)
+
+def preview_sheet(workbook, sheet_name=0, rows=EXCEL_PREVIEW_ROWS):
+    """The first rows of a sheet, parsing no further than those rows."""
+    return workbook.parse(sheet_name, nrows=rows)
+
+def _sheet_rows(source, sheet_name, excel_engine):
+    """Yield the rows of a sheet as sequences of cell values, one row at a time.
+
+    openpyxl reads the sheet XML in read-only mode as a stream; calamine parses
+    natively and hands over one row at a time.
+    """
+    _rewind(source)
+    if excel_engine == "calamine":
+        workbook = python_calamine.CalamineWorkbook.from_object(source)
+        if isinstance(sheet_name, int):
+            sheet = workbook.get_sheet_by_index(sheet_name)
+        else:
+            sheet = workbook.get_sheet_by_name(sheet_name)
+        yield from sheet.iter_rows()
+        return
+    import openpyxl
+    workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[sheet_name] if isinstance(sheet_name, int) else workbook[sheet_name]
+        yield from sheet.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+def _excel_cell(value):
+    """Normalize a cell as pandas' Excel readers do: empty is missing, whole floats are ints."""
+    if value == "":
+        return None
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+def _without_trailing_blank_rows(rows):
+    """The rows of a sheet up to the last one with a value, as pandas reads a whole sheet.
+
+    Rows after the data that are only formatted come back from the reader
+    with every cell empty; empty rows between data rows are kept.
+    """
+    blank = []
+    for row in rows:
+        if all(value is None or value == "" for value in row):
+            blank.append(row)
+        else:
+            yield from blank
+            blank = []
+            yield row
+
+def _excel_chunk(rows, names, positions, start, plan):
+    df = pd.DataFrame(
+        [[_excel_cell(row[i]) if i < len(row) else None for i in positions] for row in rows],
+        columns=names,
+        index=pd.RangeIndex(start, start + len(rows)),
+    )
+    return convert_number_fields(df.infer_objects(), plan)
+
+def iter_excel_chunks(source, chunksize, plan=None, sheet_name=0, excel_engine=None):
+    """Yield an Excel sheet as DataFrames of at most ``chunksize`` rows.
+
+    Rows are streamed from the workbook, so memory stays bounded by the chunk
+    size instead of the sheet size. Legacy .xls workbooks cannot be streamed
+    by openpyxl and are read whole unless calamine is used.
+    """
+    excel_engine = resolve_excel_engine(excel_engine)
+    if excel_engine == "openpyxl" and Path(source_name(source)).suffix.lower() == ".xls":
+        yield read_excel(source, plan, sheet_name=sheet_name)
+        return
+    rows = _sheet_rows(source, sheet_name, excel_engine)
+    header = next(rows, ())
+    header = [f"Unnamed: {i}" if value in (None, "") else str(value) for i, value in enumerate(header)]
+    names = projected_columns(header, plan)
+    positions = [header.index(name) for name in names]
+    start = 0
+    pending = []
+    for row in _without_trailing_blank_rows(rows):
+        pending.append(row)
+        if len(pending) == chunksize:
+            yield _excel_chunk(pending, names, positions, start, plan)
+            start += len(pending)
+            pending = []
+    if pending or start == 0:
+        yield _excel_chunk(pending, names, positions, start, plan)
+
+def select_columns(df, plan):
+    """Keep only the columns the mapping references, for readers without column selection."""
+    if plan is None:
+        return df
+    return df[projected_columns(list(df.columns), plan)]
+
+def is_json_lines(source):
+    return Path(source_name(source)).suffix.lower() in JSON_LINES_EXTENSIONS
+
+def read_json(source, plan=None):
+    """Read a JSON document, or NDJSON / JSON Lines by extension, keeping the referenced columns.
+
+    Values keep their JSON types: pandas' dtype and date guessing is off, so
+    "00123" stays text, as in the record-by-record readers.
+    """
+    df = pd.read_json(source, lines=is_json_lines(source), dtype=False, convert_dates=False)
+    return convert_number_fields(select_columns(df, plan), plan)
+
+@contextmanager
+def _text_input(source):
+    """The source as a UTF-8 text stream, without closing an uploaded file afterwards."""
+    if is_local_path(source):
+        with open(source, encoding="utf-8") as f:
+            yield f
+    else:
+        _rewind(source)
+        text = io.TextIOWrapper(source, encoding="utf-8")
+        try:
+            yield text
+        finally:
+            text.detach()
+
+def _starts_with_array(text):
+    """Skip leading whitespace and tell whether the document is a top-level array."""
+    while True:
+        char = text.read(1)
+        if not char or not char.isspace():
+            return char == "["
+
+def _iter_array_items(text):
+    """Yield the items of a top-level JSON array one by one, decoding block by block.
+
+    ``text`` is positioned just after the opening bracket. Items must be
+    separated by commas and the array closed by ``]``; otherwise ValueError.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    done = False
+    items = 0
+    expect_item = True  # after "[" or ","; otherwise a "," or "]" comes next
+    while True:
+        while position < len(buffer) and buffer[position].isspace():
+            position += 1
+        if position < len(buffer):
+            char = buffer[position]
+            if not expect_item:
+                if char == "]":
+                    return
+                if char != ",":
+                    raise ValueError(f"Expected ',' or ']' after item {items} of the JSON array, found {char!r}.")
+                position += 1
+                expect_item = True
+                continue
+            if char == "]" and items == 0:
+                return
+            # Only decode once a complete item may be in the buffer.
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if done:
+                    raise
+            else:
+                if end < len(buffer) or done:
+                    yield item
+                    items += 1
+                    position = end
+                    expect_item = False
+                    continue
+        if done:
+            raise ValueError("Unexpected end of JSON array: missing ']'.")
+        block = text.read(JSON_BLOCK_SIZE)
+        done = not block
+        buffer = buffer[position:] + block
+        position = 0
+
+def _ijson_array_items(data):
+    """Items of a top-level JSON array read with ijson; its parse errors become ValueError."""
+    try:
+        yield from ijson.items(data, "item", use_float=True)
+    except ijson.JSONError as e:
+        raise ValueError(f"Invalid JSON array: {e}") from e
+
+def _json_records_chunk(records, start, plan):
+    df = pd.DataFrame.from_records(records, index=pd.RangeIndex(start, start + len(records)))
+    return convert_number_fields(select_columns(df, plan), plan)
+
+def _iter_json_array(source, chunksize, plan):
+    """Yield the records of a top-level JSON array as DataFrames of ``chunksize`` rows.
+
+    Documents of any other shape are read whole with pandas.
+    """
+    with _text_input(source) as text:
+        if not _starts_with_array(text):
+            is_array = False
+        elif ijson is None:
+            yield from _chunk_records(_iter_array_items(text), chunksize, plan)
+            return
+        else:
+            is_array = True
+    if not is_array:
+        _rewind(source)
+        yield read_json(source, plan)
+        return
+    _rewind(source)
+    with open(source, "rb") if is_local_path(source) else nullcontext(source) as data:
+        yield from _chunk_records(_ijson_array_items(data), chunksize, plan)
+
+def _chunk_records(records, chunksize, plan):
+    start = 0
+    pending = []
+    for record in records:
+        pending.append(record)
+        if len(pending) == chunksize:
+            yield _json_records_chunk(pending, start, plan)
+            start += len(pending)
+            pending = []
+    if pending or start == 0:
+        yield _json_records_chunk(pending, start, plan)
+
+def iter_json_chunks(source, chunksize, plan=None):
+    """Yield JSON records as DataFrames of at most ``chunksize`` rows.
+
+    NDJSON / JSON Lines is read line by line; a JSON document must be a
+    top-level array of records, which is decoded item by item (with ijson
+    when installed). Either way memory stays bounded by the chunk size.
+    """
+    if is_json_lines(source):
+        _rewind(source)
+        with pd.read_json(source, lines=True, chunksize=chunksize, dtype=False, convert_dates=False) as reader:
+            for chunk in reader:
+                yield convert_number_fields(select_columns(chunk, plan), plan)
+    else:
+        yield from _iter_json_array(source, chunksize, plan)
+
+def read_data(source, plan=None, engine=None, excel_engine=None):
+    """Read data from CSV, Excel, JSON or Parquet into a DataFrame.
+
+    ``source`` may be a local path or a file-like object with a ``name``
+    attribute, such as a Streamlit upload, either optionally compressed. Given a compiled TransformPlan,
+    only the source columns its mapping references are read (and, for CSV,
+    typed from it); ``engine`` picks the CSV parser and ``excel_engine`` the
+    Excel one.
+    """
+    if source is None:
+        return None
+    with decompressed(source) as data:
+        ext = Path(source_name(data)).suffix.lower()
+        if ext == '.csv':
+            df = read_csv(data, plan, engine)
+        elif ext in ['.xls', '.xlsx']:
+            df = read_excel(data, plan, excel_engine)
+        elif ext == '.json' or ext in JSON_LINES_EXTENSIONS:
+            df = read_json(data, plan)
+        elif ext == '.parquet':
+            df = read_parquet(data, plan)
+        else:
+            raise ValueError("Unsupported file type. Supported: CSV, XLS, XLSX, JSON, JSON Lines, Parquet")
+    return df
+
+def _iter_csv_arrow(source, plan, chunksize):
+    read_options, parse_options, convert_options = _arrow_csv_options(source, plan, streaming=True)
+    start = 0
+    with _arrow_input(source) as data, pa_csv.open_csv(
+        data, read_options=read_options, parse_options=parse_options, convert_options=convert_options
+    ) as reader:
+        pending = pa.Table.from_batches([], schema=reader.schema)
+        for batch in reader:
+            pending = pa.concat_tables([pending, pa.Table.from_batches([batch])])
+            while pending.num_rows >= chunksize:
+                yield _arrow_to_frame(pending.slice(0, chunksize), start)
+                start += chunksize
+                pending = pending.slice(chunksize)
+        if pending.num_rows or start == 0:
+            yield _arrow_to_frame(pending, start)
+
+def iter_parquet_chunks(source, chunksize, plan=None):
+    """Yield a Parquet file in row batches, selecting only the referenced columns."""
+    import pyarrow.parquet as pq
+    parquet_file = pq.ParquetFile(source, **_pandas_input_options(source))
+    columns = projected_columns(parquet_file.schema_arrow.names, plan)
+    start = 0
+    for batch in parquet_file.iter_batches(batch_size=chunksize, columns=columns):
+        yield convert_number_fields(_arrow_to_frame(pa.Table.from_batches([batch]), start), plan)
+        start += batch.num_rows
+    if start == 0:
+        yield convert_number_fields(_arrow_to_frame(parquet_file.schema_arrow.empty_table().select(columns)), plan)
+
+def iter_csv_chunks(source, chunksize, plan=None, engine=None):
+    """Yield a CSV as DataFrames of at most ``chunksize`` rows, typed from the plan."""
+    engine = resolve_engine(engine)
+    if engine == "pyarrow":
+        for chunk in _iter_csv_arrow(source, plan, chunksize):
+            yield convert_number_fields(chunk, plan)
+        return
+    options = {**_pandas_input_options(source), **_pandas_csv_options(source, plan)}
+    with pd.read_csv(source, chunksize=chunksize, **options) as reader:
+        for chunk in reader:
+            yield convert_number_fields(chunk, plan)
+
+def iter_data_chunks(source, chunksize, plan=None, engine=None, excel_engine=None):
+    """Yield the data as DataFrames of at most ``chunksize`` rows.
+
+    CSV, Parquet, Excel (first sheet), JSON Lines and top-level JSON arrays
+    are read incrementally, so memory stays bounded by the chunk size.
+    Anything else is yielded as one frame. Compressed files are decompressed
+    as a stream on the way in.
+    """
+    with decompressed(source) as data:
+        ext = Path(source_name(data)).suffix.lower()
+        if ext == '.csv':
+            yield from iter_csv_chunks(data, chunksize, plan, engine)
+        elif ext == '.parquet':
+            yield from iter_parquet_chunks(data, chunksize, plan)
+        elif ext in ['.xls', '.xlsx']:
+            yield from iter_excel_chunks(data, chunksize, plan, excel_engine=excel_engine)
+        elif ext == '.json' or ext in JSON_LINES_EXTENSIONS:
+            yield from iter_json_chunks(data, chunksize, plan)
+        else:
+            yield read_data(data, plan, engine, excel_engine)
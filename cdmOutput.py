@@ -0,0 +1,156 @@
+"""Writers for the transformed CDM frame.
+
+Inside the pipeline date fields are datetime64; they are formatted as the
+CDM's dd/mm/yyyy strings only here, when a text output is written. The
+Parquet dataset writer keeps them as dates.
+"""
+import re
+import tempfile
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+except ImportError:  # pyarrow is optional; only the Parquet dataset writer needs it
+    pa = None
+
+from cdmCompression import open_output
+from cdmDates import format_datetimes
+
+CDM_DATE_FORMAT = "%d/%m/%Y"
+# Outputs larger than this are spooled to a temporary file on disk instead of memory.
+SPOOL_MAX_SIZE = 64 * 2**20
+# Rows formatted and written at a time when spooling.
+SPOOL_CHUNKSIZE = 100_000
+# CDM fields a Parquet dataset is partitioned by; date fields partition by year.
+PARQUET_PARTITION_BY = ("Date of Surgery", "Primary Intervention")
+# Rows per Parquet row group.
+PARQUET_ROW_GROUP_SIZE = 128 * 1024
+
+def to_output_frame(cdm_df):
+    """Shallow copy of the CDM frame with datetime columns formatted as dd/mm/yyyy."""
+    date_columns = [col for col in cdm_df.columns if pd.api.types.is_datetime64_any_dtype(cdm_df[col])]
+    if not date_columns:
+        return cdm_df
+    output_df = cdm_df.copy(deep=False)
+    for col in date_columns:
+        output_df[col] = format_datetimes(cdm_df[col], CDM_DATE_FORMAT)
+    return output_df
+
+def write_csv(cdm_df, target, header=True):
+    """Write the CDM frame as CSV to a path or open text/binary buffer."""
+    to_output_frame(cdm_df).to_csv(target, index=False, header=header)
+
+def spool_csv(cdm_df, compression=None, member_name="cdm_compliant_data.csv", max_size=SPOOL_MAX_SIZE):
+    """Write the CDM CSV, optionally compressed, into a temporary file for download.
+
+    The file stays in memory up to ``max_size`` bytes and moves to disk
+    beyond that; rows are formatted in chunks, so only one chunk of text
+    exists at a time. Returns the file, positioned at the start.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=max_size)
+    with open_output(spool, compression, member_name) as out:
+        for start in range(0, max(len(cdm_df), 1), SPOOL_CHUNKSIZE):
+            write_csv(cdm_df.iloc[start:start + SPOOL_CHUNKSIZE], out, header=start == 0)
+    spool.seek(0)
+    return spool
+
+def spool_reader(spool):
+    """The download data of a spooled file: a callable returning its bytes.
+
+    st.download_button takes bytes, a few concrete buffer types or a callable
+    (called only when the button is clicked), but not a spooled temporary file.
+    """
+    def read():
+        spool.seek(0)
+        return spool.read()
+    return read
+
+def partition_key(cdm_field, is_date):
+    """Hive partition key of a CDM field, e.g. Date of Surgery -> date_of_surgery_year."""
+    key = re.sub(r"\W+", "_", cdm_field.strip().lower()).strip("_")
+    return f"{key}_year" if is_date else key
+
+def _with_partition_keys(cdm_df, partition_by):
+    """The frame with a key column per partition field: the year of a date, else the value as text."""
+    keys = {}
+    for field in partition_by:
+        if field not in cdm_df.columns:
+            raise ValueError(f"Cannot partition by '{field}': not a column of the CDM output.")
+        col_data = cdm_df[field]
+        is_date = pd.api.types.is_datetime64_any_dtype(col_data)
+        keys[partition_key(field, is_date)] = col_data.dt.year.astype("Int32") if is_date else col_data.astype("string")
+    return cdm_df.assign(**keys), list(keys)
+
+def _parquet_schema(table):
+    """Schema all chunks are cast to: dates as date32, dictionaries with int32 indices."""
+    fields = []
+    for field in table.schema:
+        if pa.types.is_timestamp(field.type):
+            field = field.with_type(pa.date32())
+        elif pa.types.is_dictionary(field.type):
+            field = field.with_type(pa.dictionary(pa.int32(), pa.string()))
+        elif pa.types.is_large_string(field.type) or pa.types.is_null(field.type):
+            field = field.with_type(pa.string())
+        fields.append(field)
+    return pa.schema(fields)
+
+def _cast_to_schema(table, schema):
+    """Cast a chunk to the dataset schema; only timestamps may lose their time of day, becoming dates.
+
+    Any other type difference between chunks must convert without loss, or
+    the cast raises instead of silently truncating values.
+    """
+    for i, field in enumerate(schema):
+        column = table.column(i)
+        if pa.types.is_timestamp(column.type) and pa.types.is_date32(field.type):
+            table = table.set_column(i, table.field(i).name, column.cast(pa.date32(), safe=False))
+    return table.cast(schema)
+
+def _parquet_table(cdm_df, partition_by):
+    df, keys = _with_partition_keys(cdm_df, partition_by)
+    return pa.Table.from_pandas(df, preserve_index=False), keys
+
+def write_parquet_dataset(cdm_frames, root, partition_by=PARQUET_PARTITION_BY, row_group_size=PARQUET_ROW_GROUP_SIZE):
+    """Write CDM frames as a Hive-partitioned Parquet dataset under ``root``.
+
+    ``cdm_frames`` is one frame or an iterable of frames (e.g. streamed
+    chunks) with the same columns. Each file lies in a directory per
+    partition value, e.g. date_of_surgery_year=2021/primary_intervention=HIPPR,
+    so queries filtering on those fields only read the matching files. The
+    files keep every CDM column; categorical fields are dictionary encoded.
+    Partitions already under ``root`` that are written again are replaced.
+    """
+    if pa is None:
+        raise ValueError("The Parquet dataset writer needs the pyarrow package.")
+    if isinstance(cdm_frames, pd.DataFrame):
+        cdm_frames = [cdm_frames]
+    frames = iter(cdm_frames)
+    first = next(frames, None)
+    if first is None:
+        return
+    table, keys = _parquet_table(first, partition_by)
+    schema = _parquet_schema(table)
+    categorical = [
+        col for col in first.columns if isinstance(first[col].dtype, pd.CategoricalDtype)
+    ] + keys
+
+    def batches():
+        yield from _cast_to_schema(table, schema).to_batches()
+        for cdm_df in frames:
+            yield from _cast_to_schema(_parquet_table(cdm_df, partition_by)[0], schema).to_batches()
+
+    parquet_format = ds.ParquetFileFormat()
+    ds.write_dataset(
+        batches(),
+        root,
+        schema=schema,
+        format=parquet_format,
+        partitioning=ds.partitioning(pa.schema([schema.field(key) for key in keys]), flavor="hive") if keys else None,
+        file_options=parquet_format.make_write_options(use_dictionary=categorical),
+        basename_template="part-{i}.parquet",
+        min_rows_per_group=row_group_size,
+        max_rows_per_group=row_group_size,
+        existing_data_behavior="delete_matching",
+    )
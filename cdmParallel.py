@@ -0,0 +1,98 @@
+"""Multi-process, row-partitioned execution of apply_transformations.
+
+The input frame is split into contiguous row partitions that are
+transformed in a ProcessPoolExecutor with the same compiled TransformPlan.
+Results are reassembled in the original row order.
+"""
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from cdmDates import DateColumnReport, prime_report
+from cdmTransform import apply_transformations, compile_mapping
+
+# Frames smaller than this are transformed in-process; pickling to workers would cost more.
+MIN_PARALLEL_ROWS = 50_000
+
+def default_workers():
+    return os.cpu_count() or 1
+
+def transform_partition(part, plan, date_reports):
+    """Worker: transform one partition, returning its result, date reports and warnings."""
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        cdm_part = apply_transformations(part, plan, date_reports=date_reports)
+    return cdm_part, date_reports, [str(warning.message) for warning in caught]
+
+def prime_date_reports(df, plan, date_reports):
+    """Pin the date format of every mapped date column from the whole frame."""
+    for rule in plan.rules:
+        if rule.data_type != "date" or rule.source is None or rule.source not in df.columns:
+            continue
+        report = date_reports.setdefault(rule.source, DateColumnReport(column=rule.source, cdm_field=rule.cdm_field))
+        prime_report(df[rule.source], report)
+
+def concat_partitions(parts):
+    """Concatenate transformed partitions in order, keeping categorical columns categorical.
+
+    Partitions can end up with different extra categories, so each categorical
+    column is first given the union of categories (allowed values first).
+    """
+    if len(parts) == 1:
+        return parts[0]
+    parts = [part.copy(deep=False) for part in parts]
+    for col in parts[0].columns:
+        if not isinstance(parts[0][col].dtype, pd.CategoricalDtype):
+            continue
+        categories = list(dict.fromkeys(value for part in parts for value in part[col].cat.categories))
+        for part in parts:
+            part[col] = part[col].cat.set_categories(categories)
+    return pd.concat(parts)
+
+def transform_parallel(df, mappings, workers=None, date_reports=None, executor=None):
+    """Transform ``df`` in row partitions across ``workers`` processes.
+
+    Date formats are inferred once on the whole frame before partitioning, so
+    the result equals a single-process apply_transformations. Pass an
+    ``executor`` to reuse one process pool across calls (e.g. per chunk).
+    """
+    plan = compile_mapping(mappings)
+    workers = workers or default_workers()
+    if date_reports is None:
+        date_reports = {}
+    if workers <= 1 or len(df) < MIN_PARALLEL_ROWS:
+        return apply_transformations(df, plan, date_reports=date_reports)
+
+    prime_date_reports(df, plan, date_reports)
+    bounds = np.linspace(0, len(df), workers + 1, dtype=np.int64)
+    partitions = [df.iloc[start:stop] for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+    partition_reports = [
+        {source: report.without_counts() for source, report in date_reports.items()}
+        for _ in partitions
+    ]
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        results = list(executor.map(
+            transform_partition,
+            partitions,
+            [plan] * len(partitions),
+            partition_reports,
+        ))
+    finally:
+        if own_executor:
+            executor.shutdown()
+
+    messages = {}
+    for _, reports, part_messages in results:
+        for source, report in reports.items():
+            date_reports[source].add_counts(report)
+        messages.update(dict.fromkeys(part_messages))
+    for message in messages:
+        warnings.warn(message)
+    return concat_partitions([cdm_part for cdm_part, _, _ in results])
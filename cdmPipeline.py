@@ -0,0 +1,91 @@
+"""Pipelined chunk transformation: read, transform and write at the same time.
+
+A reader thread pulls chunks from the input while a process pool transforms
+earlier chunks and the caller writes the ones already done, so throughput
+approaches the slowest stage instead of the sum of all three. A semaphore
+caps the chunks that have been read but not yet written, which bounds memory.
+"""
+import queue
+import threading
+import warnings
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_all_start_methods, get_context
+
+from cdmParallel import prime_date_reports, transform_partition
+
+# Chunks read but not yet written, at most.
+DEFAULT_MAX_IN_FLIGHT = 4
+
+# Workers start from a fork server (spawned where there is none), never
+# forked from this process: forking once the reader thread runs could copy a
+# lock it holds into a worker, which would then hang.
+WORKER_CONTEXT = get_context("forkserver" if "forkserver" in get_all_start_methods() else "spawn")
+
+_DONE = object()
+
+def _read_ahead(chunks, ready, slots, stop):
+    """Reader thread: put chunks on ``ready`` while a slot is free, then _DONE (or the error)."""
+    try:
+        while True:
+            slots.acquire()
+            if stop.is_set():
+                return
+            chunk = next(chunks, _DONE)
+            ready.put(chunk)
+            if chunk is _DONE:
+                return
+    except Exception as e:
+        ready.put(e)
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+def pipelined_transform(chunks, plan, date_reports, workers=1, max_in_flight=DEFAULT_MAX_IN_FLIGHT):
+    """Transform ``chunks`` in ``workers`` processes while the next ones are read.
+
+    Yields the transformed chunks in input order, for the caller to write
+    while later chunks are still being read and transformed. Date formats are
+    pinned chunk by chunk in input order before a chunk is handed out, so the
+    result equals transforming the chunks one after another.
+    """
+    slots = threading.Semaphore(max(max_in_flight, 1))
+    ready = queue.Queue()
+    stop = threading.Event()
+    reader = threading.Thread(target=_read_ahead, args=(iter(chunks), ready, slots, stop), daemon=True)
+    executor = ProcessPoolExecutor(max_workers=max(workers, 1), mp_context=WORKER_CONTEXT)
+    pending = deque()
+    exhausted = False
+    reader.start()
+    try:
+        while True:
+            # Hand out every chunk read so far; wait for the reader only when nothing is in progress.
+            while not exhausted:
+                try:
+                    chunk = ready.get(block=not pending)
+                except queue.Empty:
+                    break
+                if chunk is _DONE:
+                    exhausted = True
+                elif isinstance(chunk, Exception):
+                    raise chunk
+                else:
+                    prime_date_reports(chunk, plan, date_reports)
+                    chunk_reports = {source: report.without_counts() for source, report in date_reports.items()}
+                    pending.append(executor.submit(transform_partition, chunk, plan, chunk_reports))
+            if not pending:
+                return
+            cdm_chunk, chunk_reports, messages = pending.popleft().result()
+            for source, report in chunk_reports.items():
+                date_reports[source].add_counts(report)
+            for message in dict.fromkeys(messages):
+                warnings.warn(message)
+            yield cdm_chunk
+            slots.release()
+    finally:
+        stop.set()
+        for _ in range(max(max_in_flight, 1)):
+            slots.release()
+        executor.shutdown(cancel_futures=True)
+        reader.join()
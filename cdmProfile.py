@@ -0,0 +1,116 @@
+"""Column statistics and profiles for the mapping app, computed once per loaded dataset.
+
+The mapping form offers one value mapping per distinct value of a
+categorical column. Scanning a column for those values on every Streamlit
+rerun is what made the form slow on large extracts, so each column is
+counted once, the first time the form asks for it, and kept with the
+dataset. The "Extracted Columns" table is built from frame-wide
+aggregations and a row sample rather than by counting every column.
+"""
+import math
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+# Values shown per column in the profile.
+PROFILE_SAMPLE_VALUES = 5
+# Rows sampled per column to estimate its distinct values.
+PROFILE_DISTINCT_SAMPLE = 10_000
+
+@dataclass(frozen=True)
+class ColumnStats:
+    """Distinct values of one column with their counts, in order of first appearance, and its nulls.
+
+    ``counts`` is the column's value_counts Series, indexed by the values.
+    """
+    column: str
+    counts: pd.Series
+    nulls: int
+    rows: int
+
+    @property
+    def values(self):
+        return self.counts.index
+
+    @property
+    def distinct(self):
+        return len(self.counts)
+
+class DatasetStats:
+    """ColumnStats per column of one dataset, each column counted the first time it is asked for."""
+
+    def __init__(self, df):
+        self.df = df
+        self._columns = {}
+
+    def __getitem__(self, column):
+        if column not in self._columns:
+            col_data = self.df[column]
+            counts = col_data.value_counts(sort=False, dropna=True)
+            counts = counts[counts > 0]  # categoricals also list unused categories
+            self._columns[column] = ColumnStats(column, counts, len(col_data) - int(counts.sum()), len(col_data))
+        return self._columns[column]
+
+    def __contains__(self, column):
+        return column in self._columns
+
+def column_stats(df):
+    """Lazily counted ColumnStats for the columns of ``df``."""
+    return DatasetStats(df)
+
+def estimate_distinct(sample, population):
+    """Estimated distinct values of a column from a sample of it.
+
+    ``population`` is the column's non-null row count. Exact when the sample
+    holds every non-null value; otherwise the GEE estimator scales up the
+    values seen only once in the sample by sqrt(population / sample size).
+    """
+    counts = sample.value_counts(sort=False, dropna=True).to_numpy()
+    counts = counts[counts > 0]
+    seen = int(counts.sum())
+    if seen == 0 or seen >= population:
+        return len(counts)
+    singletons = int((counts == 1).sum())
+    estimate = math.sqrt(population / seen) * singletons + len(counts) - singletons
+    return min(round(estimate), population)
+
+def _formatted(values):
+    return [None if pd.isna(value) else str(value) for value in values]
+
+def profile_columns(df):
+    """One row per column of ``df``: dtype, sample values, null fraction, approximate distinct count, min and max.
+
+    Nulls, samples, minimum and maximum come from whole-frame operations (min
+    and max once per dtype, so values keep their type, and for numeric,
+    boolean and datetime columns only). Distinct values are estimated from
+    PROFILE_DISTINCT_SAMPLE rows, so no column is counted in full.
+    """
+    rows = len(df)
+    nulls = df.isna().sum().to_numpy()
+    if rows > PROFILE_DISTINCT_SAMPLE:
+        sample = df.iloc[np.sort(np.random.default_rng(0).choice(rows, PROFILE_DISTINCT_SAMPLE, replace=False))]
+    else:
+        sample = df
+    samples = df.head(PROFILE_SAMPLE_VALUES).to_numpy(dtype=object).T
+    positions_by_dtype = {}
+    for position, dtype in enumerate(df.dtypes):
+        if pd.api.types.is_numeric_dtype(dtype) or pd.api.types.is_datetime64_any_dtype(dtype):
+            positions_by_dtype.setdefault(dtype, []).append(position)
+    minimum = [None] * len(df.columns)
+    maximum = [None] * len(df.columns)
+    for positions in positions_by_dtype.values():
+        columns = df.iloc[:, positions]
+        for position, low, high in zip(positions, _formatted(columns.min()), _formatted(columns.max())):
+            minimum[position], maximum[position] = low, high
+    return pd.DataFrame({
+        "Column Name": [str(column) for column in df.columns],
+        "Data Type": df.dtypes.astype(str).tolist(),
+        "Sample Values": [", ".join(str(value) for value in values) for values in samples],
+        "Null Fraction": (nulls / rows if rows else nulls * 0.0).tolist(),
+        "Approx. Distinct Values": [
+            estimate_distinct(sample.iloc[:, position], rows - int(nulls[position])) for position in range(len(df.columns))
+        ],
+        "Min": minimum,
+        "Max": maximum,
+    })
@@ -0,0 +1,280 @@
+"""Core CDM transformation logic shared by the Streamlit app and the batch CLI.
+
+Nothing in this module imports streamlit, so it can be used headless.
+"""
+import datetime
+import os
+import warnings
+from dataclasses import dataclass, field as dataclass_field
+
+import numpy as np
+import pandas as pd
+import yaml
+
+from cdmDates import DateColumnReport, parse_dates
+
+CDM_FIELDS = [
+    
+    {"id": "1A", "name": "Patient ID", "data_type": "uuid", "values":"", "preferred_standard": None, "description": "A unique patient identification number."},
+    {"id": "2A", "name": "Primary Intervention", "data_type": "categorical", "values":  ["HIPPR","TOTKNIE","HMKNIE"], "preferred_standard": None, "description": "Primary total hip replacement or primary total or hemi knee replacement performed within surveillance period."},
+    {"id": "3A", "name": "Date of Surgery", "data_type": "date", "values": "dd/mm/yyyy", "preferred_standard": None, "description": "Date the primary hip or knee replacement was performed."},
+    {"id": "4A", "name": "Operation Side", "data_type": "categorical", "values": ["left","right"], "preferred_standard": None, "description": "Was the surgery performed in the left or right joint?"},
+    {"id": "5A", "name": "Previous Intervention", "data_type": "bool", "values": ["yes","no"], "preferred_standard": None, "description": "Previous operations on the hip or knee joint in question that are considered exclusion criteria (i.e., not arthroscopy, meniscectomy or cruciate ligament reconstruction)."},
+    {"id": "6A", "name": "Discharge Date", "data_type": "date", "values": "dd/mm/yyyy", "preferred_standard": "SCT (442864001)", "description": "Discharge date of admission in which indicator intervention took place."},
+    {"id": "7A", "name": "Readmission Date", "data_type": "date", "values": "dd/mm/yyyy", "preferred_standard": None, "description": "Date of admission of any readmission to the treating specialty indicator procedure within 120 days after the main procedure."},
+    {"id": "8A", "name": "Treating Specialty", "data_type": "categorical", "values": ["orthopedic surgeon", "general surgeon","trauma surgeon"], "preferred_standard": "SCT (69280009)", "description": "Specialty where the patient has been readmitted."},
+    {"id": "9A", "name": "Reoperation Date", "data_type": "date", "values": "dd/mm/yyyy", "preferred_standard": None, "description": "Date of any necessary orthopedic reoperation within 120 days after the indicator procedure."},
+    {"id": "10A", "name": "Reoperation Specialty", "data_type": "categorical", "values": ["orthopedic surgeon", "general surgeon","trauma surgeon"], "preferred_standard": "SCT (69280009)", "description": "Specialty that performed the reoperation."},
+    {"id": "11A", "name": "Culture Collection Date", "data_type": "date", "values": "dd/mm/yyyy", "preferred_standard": None, "description": "Date of culture for microbiological examination from day 1 after the indicator procedure up to and including 120 days after the main procedure."},
+    {"id": "12A", "name": "Sample number culture collection", "data_type": "number", "values": "", "preferred_standard": "SCT (260385009)", "description": "Identification number of the material taken for microbiological examination within 120 days after the main procedure."},
+    {"id": "13A", "name": "Breeding Material", "data_type": "categorical", "values": ["blood (sample)","wound fluid sample (sample)"], "preferred_standard": "SCT (61594008)", "description": "The material taken for microbiological examination within 120 days after the main procedure."},
+    {"id": "14A", "name": "Result", "data_type": "categorical", "values": ["positive","negative"], "preferred_standard": "SCT (260385009)", "description": "Result of the microbiological examination within 120 days after the main procedure."},
+    {"id": "15A", "name": "Antibiotic Code", "data_type": "number", "values": "ATCDDD - ATC/DDD Index (fhi.no)", "preferred_standard": "SCT (281789004)", "description": "Code of any antibiotics used in the period up to 120 days after the primary hip or knee prosthesis."},
+    {"id": "16A", "name": "Prescription Start Date", "data_type": "date", "values": "dd/mm/yyyy", "preferred_standard": "SCT (413946009)", "description": "Start date of any use of antibiotics in the period up to 120 days after the primary hip or knee prosthesis."},
+    {"id": "17A", "name": "Prescription End Date", "data_type": "date", "values": "dd/mm/yyyy", "preferred_standard": "SCT (413947000)", "description": "End date of any use of antibiotics in the period up to 120 days after the primary hip or knee prosthesis."}
+]
+
+
+def load_mapping(mapping_file):
+    """Load the YAML mapping file (path or open stream) and return its mappings."""
+    if mapping_file is None:
+        return {}
+    try:
+        if isinstance(mapping_file, (str, os.PathLike)):
+            with open(mapping_file, "r", encoding="utf-8") as f:
+                mappings = yaml.safe_load(f)
+        else:
+            mappings = yaml.safe_load(mapping_file)
+    except Exception as e:
+        raise ValueError(f"Error reading YAML mapping: {e}") from e
+    if not isinstance(mappings, dict):
+        return {}
+    return mappings.get('mappings', {}) or {}
+
+CDM_FIELDS_BY_NAME = {field["name"]: field for field in CDM_FIELDS}
+
+def map_values(col_data, rule):
+    """Apply the rule's value mapping, keeping the original value where there is no match."""
+    if rule.value_mapping is None:
+        return col_data
+    return col_data.map(rule.value_mapping).fillna(col_data)
+
+def convert_passthrough(col_data, rule, date_reports):
+    """Keep the source values as they are, apart from any value mapping."""
+    return map_values(col_data, rule)
+
+def convert_date(col_data, rule, date_reports):
+    """Parse dates with the cdmDates engine into datetime64.
+
+    Dates stay typed inside the pipeline; cdmOutput formats them as
+    dd/mm/yyyy only when the CSV is written.
+
+    The format inferred for a source column is pinned in its DateColumnReport
+    in ``date_reports`` (if given) and reused for later chunks of the same file.
+    """
+    report = date_reports.get(rule.source) if date_reports is not None else None
+    if report is None:
+        report = DateColumnReport(column=rule.source, cdm_field=rule.cdm_field)
+        if date_reports is not None:
+            date_reports[rule.source] = report
+    return parse_dates(col_data, report)
+
+def _other_source_texts(key):
+    """Other ways than str(key) a YAML key may be written in a source read as text.
+
+    mapApp reads files without a plan, so its keys can be booleans or floats
+    the reader inferred (True for "true", 5.0 for "5") while the transform
+    reads the same column as text.
+    """
+    if isinstance(key, bool):
+        return [str(key).lower(), str(key).upper()]
+    if isinstance(key, float) and key.is_integer():
+        return [str(int(key))]
+    return []
+
+def convert_categorical(col_data, rule, date_reports):
+    """Emit a pandas Categorical whose categories are the CDM field's allowed values.
+
+    The value mapping is applied to the distinct source values (the
+    categories) rather than to every row. Source values without a mapping are
+    kept, as extra categories after the allowed ones.
+    """
+    allowed = list(CDM_FIELDS_BY_NAME[rule.cdm_field]["values"])
+    source = col_data.astype("category")
+    value_mapping = rule.value_mapping or {}
+    # Sources read as text still match YAML keys that were numbers or booleans
+    # in mapApp; a key's own text wins over another key's other rendering
+    text_mapping = {str(key): mapped for key, mapped in value_mapping.items()}
+    for key, mapped in value_mapping.items():
+        for text in _other_source_texts(key):
+            text_mapping.setdefault(text, mapped)
+
+    targets = []
+    for value in source.cat.categories:
+        mapped = value_mapping.get(value, text_mapping.get(str(value)))
+        targets.append(value if mapped is None or pd.isna(mapped) else mapped)
+    categories = allowed + [value for value in dict.fromkeys(targets) if value not in allowed]
+
+    position = {value: i for i, value in enumerate(categories)}
+    lookup = np.array([position[value] for value in targets] + [-1], dtype=np.int64)
+    codes = lookup[source.cat.codes.to_numpy()]
+    return pd.Series(pd.Categorical.from_codes(codes, categories=categories), index=col_data.index, name=col_data.name)
+
+# Dtypes of all-null columns for unmapped fields; categorical fields use their allowed values.
+NULL_DTYPES = {
+    "date": "datetime64[ns]",
+    "bool": "boolean",
+}
+
+def null_column(rule, index):
+    """A typed all-null column for a CDM field without source data."""
+    if rule.data_type == "categorical":
+        allowed = list(CDM_FIELDS_BY_NAME[rule.cdm_field]["values"])
+        codes = np.full(len(index), -1, dtype=np.int8)
+        return pd.Series(pd.Categorical.from_codes(codes, categories=allowed), index=index)
+    return pd.Series(pd.NA, index=index, dtype=NULL_DTYPES.get(rule.data_type, "string"))
+
+# Per CDM data_type converters; types not listed are passed through unchanged.
+CONVERTERS = {
+    "date": convert_date,
+    "categorical": convert_categorical,
+}
+
+@dataclass(frozen=True)
+class FieldRule:
+    """How one CDM field is filled: its source column, converter and value mapping."""
+    cdm_field: str
+    data_type: str
+    source: str | None = None
+    value_mapping: dict | None = None
+    converter: object = convert_passthrough
+
+@dataclass(frozen=True)
+class TransformPlan:
+    """A mapping compiled once and reused for every chunk, file and session.
+
+    ``rules`` follows the CDM_FIELDS order; ``sources`` is the inverted
+    cdm_field -> source column index.
+    """
+    rules: tuple
+    sources: dict = dataclass_field(default_factory=dict)
+
+    @property
+    def source_columns(self):
+        """Source columns referenced by the mapping, in CDM_FIELDS order."""
+        return [rule.source for rule in self.rules if rule.source is not None]
+
+def compile_mapping(mappings):
+    """Validate the YAML mappings and compile them into a TransformPlan.
+
+    Raises ValueError listing every problem found, so a bad mapping fails
+    before any data is read.
+    """
+    if isinstance(mappings, TransformPlan):
+        return mappings
+    if not isinstance(mappings, dict):
+        raise ValueError("Invalid mapping: 'mappings' must be a dictionary of source columns.")
+
+    errors = []
+    sources = {}
+    value_mappings = {}
+    for col, info in mappings.items():
+        if not isinstance(info, dict) or not isinstance(info.get("cdm_field"), str):
+            errors.append(f"'{col}': missing 'cdm_field'")
+            continue
+        cdm_field = info["cdm_field"]
+        if cdm_field not in CDM_FIELDS_BY_NAME:
+            errors.append(f"'{col}': unknown CDM field '{cdm_field}'")
+            continue
+        if cdm_field in sources:
+            errors.append(f"'{col}': CDM field '{cdm_field}' is already mapped from '{sources[cdm_field]}'")
+            continue
+        transformation = info.get("transformation") or {}
+        if not isinstance(transformation, dict):
+            errors.append(f"'{col}': 'transformation' must be a dictionary")
+            continue
+        value_mapping = transformation.get("value_mapping")
+        if value_mapping is not None and not isinstance(value_mapping, dict):
+            errors.append(f"'{col}': 'value_mapping' must be a dictionary")
+            continue
+        if value_mapping and CDM_FIELDS_BY_NAME[cdm_field]["data_type"] == "date":
+            errors.append(f"'{col}': 'value_mapping' is not supported for date field '{cdm_field}'")
+            continue
+        sources[cdm_field] = col
+        value_mappings[cdm_field] = value_mapping
+    if errors:
+        raise ValueError("Invalid mapping: " + "; ".join(errors))
+
+    rules = tuple(
+        FieldRule(
+            cdm_field=field["name"],
+            data_type=field["data_type"],
+            source=sources.get(field["name"]),
+            value_mapping=value_mappings.get(field["name"]),
+            converter=CONVERTERS.get(field["data_type"], convert_passthrough),
+        )
+        for field in CDM_FIELDS
+    )
+    return TransformPlan(rules=rules, sources=sources)
+
+def apply_transformations(df, mappings, date_reports=None):
+    """Apply transformations as defined in the YAML mappings, including date formatting.
+
+    ``mappings`` is either the raw mappings dict or a TransformPlan from
+    compile_mapping; pass the plan when transforming many chunks or files.
+    ``date_reports`` is an optional dict, shared across calls on chunks of
+    the same file, that collects a cdmDates.DateColumnReport per source date
+    column: the inferred format, its day-first/month-first order and the
+    parse and failure counts. The format inferred from the first chunk with
+    values is reused for every later chunk.
+    """
+    plan = compile_mapping(mappings)
+    columns = {}
+
+    # Ensure transformed data follows the CDM_FIELDS order
+    for rule in plan.rules:
+        # If original column is not in df, fill with NaN
+        if rule.source is None or rule.source not in df.columns:
+            columns[rule.cdm_field] = null_column(rule, df.index)
+            continue
+
+        try:
+            columns[rule.cdm_field] = rule.converter(df[rule.source], rule, date_reports)
+        except Exception as e:
+            warnings.warn(f"Error converting column '{rule.source}' to {rule.data_type}: {e}")
+            columns[rule.cdm_field] = null_column(rule, df.index)
+
+    # Build the frame in one go rather than inserting column by column
+    return pd.DataFrame(columns, index=df.index)
+
+def generate_metadata(cdm_df, data_filename, mapping_filename):
+    """Generate metadata JSON file according to FAIR principles (basic example)."""
+    # Example metadata fields (customize as needed):
+    metadata = {
+        "title": "CDM-Compliant Healthcare Dataset",
+        "description": "A dataset transformed into a Common Data Model (CDM) format for healthcare procedures.",
+        "created": datetime.datetime.utcnow().isoformat() + "Z",
+        "creator": {
+            "name": "Your Organization",
+            "contact": "contact@yourorg.com"
+        },
+        "license": "CC-BY-4.0",
+        "provenance": {
+            "source_data_file": data_filename,
+            "mapping_file_used": mapping_filename,
+            "transformation_tool": "CDM Transformer App",
+            "transformation_date": datetime.datetime.utcnow().isoformat() + "Z"
+        },
+        "schema": []
+    }
+
+    # Add schema information (column names, data types)
+    for col in cdm_df.columns:
+        col_info = {
+            "name": col,
+            "data_type": str(cdm_df[col].dtype),
+            "description": f"CDM field {col}"
+        }
+        metadata["schema"].append(col_info)
+
+    return metadata
@@ -1,8 +1,11 @@
 import streamlit as st
-import pandas as pd
 import yaml
 from pathlib import Path
-from io import BytesIO
+
+from cdmCompression import data_extension
+from cdmCache import cached_read, cached_read_data
+from cdmProfile import column_stats, profile_columns
+from cdmIngest import SUPPORTED_EXTENSIONS, UPLOAD_TYPES, local_data_root, open_workbook, preview_sheet, read_excel, resolve_local_path
 
 # Define the Common Data Model fields
 CDM_FIELDS = [
@@ -27,19 +30,40 @@ CDM_FIELDS = [
 ]
 
 
+def upload_key(source):
+    """Identifies an upload (or a local file's version) across reruns."""
+    if isinstance(source, Path):
+        return f"{source}:{source.stat().st_mtime_ns}"
+    return source.file_id
+
+@st.cache_resource(max_entries=4)
+def cached_workbook(key, _source):
+    """One workbook handle per upload, shared by sheet listing, preview and load."""
+    return open_workbook(_source)
+
+def excel_workbook(source):
+    return cached_workbook(upload_key(source), source)
+
 def ingest_file(uploaded_file, sheet_name=None):
-    """Ingest file from a Streamlit upload widget, optionally specifying a sheet name for Excel."""
+    """Ingest file from a Streamlit upload widget or a server-local path, optionally specifying a sheet name for Excel.
+
+    Parsed frames are cached by content hash, so loading the same file again is instant.
+    """
     if uploaded_file is not None:
         ext = Path(uploaded_file.name).suffix.lower()
-        if ext == '.csv':
-            df = pd.read_csv(uploaded_file)
-        elif ext in ['.xls', '.xlsx']:
-            df = pd.read_excel(uploaded_file, sheet_name=sheet_name if sheet_name else 0)
-        elif ext == '.json':
-            df = pd.read_json(uploaded_file)
+        if ext in ['.xls', '.xlsx']:
+            sheet = sheet_name if sheet_name else 0
+            df = cached_read(uploaded_file, ("excel", sheet), lambda: read_excel(excel_workbook(uploaded_file), sheet_name=sheet))
         else:
-            st.error("Unsupported file type. Please upload CSV, JSON, or Excel.")
-            return None
+            # CSV, JSON and Parquet, and any supported format compressed
+            try:
+                if data_extension(uploaded_file) not in SUPPORTED_EXTENSIONS:
+                    st.error("Unsupported file type. Please upload CSV, JSON, JSON Lines, Excel or Parquet.")
+                    return None
+                df = cached_read_data(uploaded_file)
+            except ValueError as e:
+                st.error(str(e))
+                return None
         return df
     return None
 
@@ -57,11 +81,24 @@ st.title("Healthcare ETL MVP")
 # Session state initialization
 if 'df' not in st.session_state:
     st.session_state.df = None
+if 'column_stats' not in st.session_state:
+    st.session_state.column_stats = None
+if 'column_profile' not in st.session_state:
+    st.session_state.column_profile = None
 if 'show_columns_table' not in st.session_state:
     st.session_state.show_columns_table = False
 
 # Step 1: File upload
-uploaded_file = st.file_uploader("Upload a file (CSV, Excel, JSON)", type=["csv", "xlsx", "xls", "json"])
+uploaded_file = st.file_uploader("Upload a file (CSV, Excel, JSON, JSON Lines, Parquet; optionally gz/bz2/zst/zip compressed)", type=UPLOAD_TYPES)
+# Server files can only be entered by path when a data directory is configured
+local_path = None
+if local_data_root() is not None:
+    local_path = st.text_input("...or enter the path of a file in the server's data directory (read memory-mapped, without uploading)")
+if local_path:
+    try:
+        uploaded_file = resolve_local_path(local_path)
+    except ValueError as e:
+        st.error(str(e))
 sheet_name = None
 
 # If no DataFrame is loaded yet, allow selecting sheet and loading data
@@ -70,23 +107,24 @@ if uploaded_file and st.session_state.df is None:
     sheets = []
     if ext in ['.xls', '.xlsx']:
         try:
-            excel_data = uploaded_file.read()
-            uploaded_file.seek(0)  # Reset the file pointer
-            xls = pd.ExcelFile(BytesIO(excel_data))
+            xls = excel_workbook(uploaded_file)
             sheets = xls.sheet_names
         except Exception as e:
             st.error(f"Error reading Excel file: {e}")
 
         if sheets:
             sheet_name = st.selectbox("Select Sheet:", sheets)
+            st.dataframe(preview_sheet(xls, sheet_name))
         else:
             st.warning("No sheets detected. Please try another file.")
-        uploaded_file.seek(0)
 
     if st.button("Load Data"):
         df = ingest_file(uploaded_file, sheet_name=sheet_name)
         if df is not None:
             st.session_state.df = df
+            # Distinct values and counts per column, each counted once on first use instead of on every rerun
+            st.session_state.column_stats = column_stats(df)
+            st.session_state.column_profile = None
             st.success("Data Loaded Successfully")
 
 # Now, if the DataFrame is loaded into session state, show further options
@@ -100,23 +138,10 @@ if st.session_state.df is not None:
     # If the user wants to see the columns, display the table
     if st.session_state.show_columns_table:
         st.subheader("Extracted Columns:")
-        df = st.session_state.df
-        columns_info = []
-        for col in df.columns:
-            dtype = df[col].dtype
-            sample_values = df[col].head(5).tolist()
-            columns_info.append({
-                "Column Name": col,
-                "Data Type": str(dtype),
-                "Sample Values": sample_values
-            })
-
-        display_data = {
-            "Column Name": [c["Column Name"] for c in columns_info],
-            "Data Type": [c["Data Type"] for c in columns_info],
-            "Sample Values": [", ".join(str(v) for v in c["Sample Values"]) for c in columns_info]
-        }
-        st.table(pd.DataFrame(display_data))
+        # Profiled once per dataset; st.dataframe stays responsive with thousands of columns
+        if st.session_state.column_profile is None:
+            st.session_state.column_profile = profile_columns(st.session_state.df)
+        st.dataframe(st.session_state.column_profile, hide_index=True)
         
 if st.session_state.df is not None:
     st.subheader("Map CDM Fields to Available Columns")
@@ -138,12 +163,12 @@ if st.session_state.df is not None:
             
             # If it's a categorical field, allow value mapping
             if is_categorical_field(field):
-                unique_values = df[selected_column].dropna().unique().tolist()
+                stats = st.session_state.column_stats[selected_column]
                 value_mapping = {}
                 st.markdown(f"**Map values for '{field['name']}'**")
-                for value in unique_values:
+                for value, count in stats.counts.items():
                     mapped_value = st.selectbox(
-                        f"Map '{value}' to CDM value for '{field['name']}'",
+                        f"Map '{value}' ({count} rows) to CDM value for '{field['name']}'",
                         field['values'] + ["Not available"],
                         key=f"{field['id']}_value_{value}"
                     )
@@ -0,0 +1,49 @@
+"""Batch runs of cdmBatch."""
+import gzip
+import zipfile
+from pathlib import Path
+
+import pytest
+import yaml
+
+from cdmBatch import BatchOptions, load_plan, transform_file
+
+MOCK_DATASET = Path(__file__).resolve().parent.parent / "mock_dataset.csv"
+
+@pytest.fixture
+def mapping_path(tmp_path):
+    path = tmp_path / "mapping.yaml"
+    path.write_text(yaml.safe_dump({"mappings": {"patient_identifier": {"cdm_field": "Patient ID"}, "operation_date": {"cdm_field": "Date of Surgery"}}}))
+    return path
+
+def truncated_gzip(tmp_path):
+    """A gzipped extract of 2000 rows cut off halfway."""
+    lines = MOCK_DATASET.read_text().splitlines()
+    text = "\n".join([lines[0]] + [line for _ in range(100) for line in lines[1:]]) + "\n"
+    data = gzip.compress(text.encode("utf-8"))
+    path = tmp_path / "extract.csv.gz"
+    path.write_bytes(data[:len(data) // 2])
+    return path
+
+@pytest.mark.parametrize("output_format", ["csv", "parquet"])
+def test_failed_streaming_run_leaves_no_output(tmp_path, mapping_path, output_format):
+    if output_format == "parquet":
+        pytest.importorskip("pyarrow")
+    output_path = tmp_path / ("out.csv" if output_format == "csv" else "out")
+    options = BatchOptions(chunksize=100, engine="c", output_format=output_format, partition_by=())
+
+    with pytest.raises(ValueError, match="truncated"):
+        transform_file(truncated_gzip(tmp_path), load_plan(mapping_path), mapping_path, output_path, options=options)
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["extract.csv.gz", "mapping.yaml"]
+
+def test_output_replaces_earlier_output(tmp_path, mapping_path):
+    output_path = tmp_path / "out.csv.zip"
+    output_path.write_bytes(b"earlier run")
+
+    rows, _ = transform_file(MOCK_DATASET, load_plan(mapping_path), mapping_path, output_path)
+
+    assert rows == 20
+    with zipfile.ZipFile(output_path) as archive:
+        assert archive.namelist() == ["out.csv"]
+    assert not list(tmp_path.glob(".partial-*"))
@@ -0,0 +1,72 @@
+"""The byte-budgeted LRU cache in cdmCache."""
+import os
+
+from cdmCache import LRUCache
+
+def cache(max_bytes, **options):
+    return LRUCache(max_bytes, sizeof=len, **options)
+
+def test_least_recently_used_entry_is_evicted():
+    lru = cache(10)
+    lru.put("a", b"aaaa")
+    lru.put("b", b"bbbb")
+    assert lru.get("a") == b"aaaa"  # "b" is now the least recently used
+
+    lru.put("c", b"cccc")
+
+    assert "a" in lru and "c" in lru and "b" not in lru
+    assert lru.nbytes == 8
+
+def test_replacing_an_entry_updates_its_size():
+    lru = cache(10)
+    lru.put("a", b"aaaaaaaa")
+    lru.put("a", b"aa")
+    lru.put("b", b"bbbbbbbb")
+
+    assert len(lru) == 2 and lru.nbytes == 10
+
+def test_value_larger_than_the_budget_is_returned_but_not_kept():
+    lru = cache(4)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return b"too large"
+
+    assert lru.get_or_compute("big", compute) == b"too large"
+    assert lru.get_or_compute("big", compute) == b"too large"
+    assert len(calls) == 2 and len(lru) == 0
+
+def test_get_or_compute_computes_once():
+    lru = cache(10)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return b"value"
+
+    assert lru.get_or_compute("key", compute) == lru.get_or_compute("key", compute) == b"value"
+    assert len(calls) == 1
+
+def test_evicted_entries_are_spilled_and_loaded_back(tmp_path):
+    lru = cache(4, spill_dir=tmp_path)
+    lru.put(("transform", "a"), b"aaaa")
+    lru.put(("transform", "b"), b"bbbb")
+
+    assert ("transform", "a") not in lru
+    assert len(list(tmp_path.glob("*.pkl"))) == 1
+    assert lru.get(("transform", "a")) == b"aaaa"
+    assert ("transform", "a") in lru  # back in memory; "b" spilled in turn
+
+def test_spill_dir_is_trimmed_oldest_first(tmp_path):
+    lru = cache(4, spill_dir=tmp_path, spill_max_bytes=60)
+    for key in "abcdef":
+        lru.put(key, key.encode("ascii") * 4)
+        # Age the files already spilled, so each spill is clearly newer
+        for path in tmp_path.glob("*.pkl"):
+            mtime = path.stat().st_mtime - 10
+            os.utime(path, (mtime, mtime))
+
+    assert sum(path.stat().st_size for path in tmp_path.glob("*.pkl")) <= 60
+    assert lru.get("e") == b"eeee"
+    assert lru.get("a") is None
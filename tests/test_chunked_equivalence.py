@@ -0,0 +1,88 @@
+"""Reading a file in chunks must give the same CDM output as reading it whole."""
+from pathlib import Path
+
+import pandas as pd
+import pyarrow.dataset as ds
+import pytest
+import yaml
+
+from cdmBatch import BatchOptions, load_plan, transform_file
+
+MOCK_DATASET = Path(__file__).resolve().parent.parent / "mock_dataset.csv"
+
+MAPPINGS = {
+    "patient_identifier": {"cdm_field": "Patient ID"},
+    "surgery_type": {
+        "cdm_field": "Primary Intervention",
+        "transformation": {"value_mapping": {"TotalKnee": "TOTKNIE", "HipReplacement": "HIPPR", "PartialKnee": "HMKNIE"}},
+    },
+    "operation_date": {"cdm_field": "Date of Surgery"},
+    "side_of_operation": {"cdm_field": "Operation Side", "transformation": {"value_mapping": {"Left": "left", "Right": "right"}}},
+    "discharge_datetime": {"cdm_field": "Discharge Date"},
+    "readmit_date": {"cdm_field": "Readmission Date"},
+    "sample_id": {"cdm_field": "Sample number culture collection"},
+    "antibiotic_code": {"cdm_field": "Antibiotic Code"},
+    "antibiotic_end": {"cdm_field": "Prescription End Date"},
+}
+
+# Chunks of 7 rows split the 20 mock rows into three chunks of different make-up.
+CHUNKSIZE = 7
+
+def mock_frame():
+    """The mock dataset with number fields that differ between chunks.
+
+    The first chunk holds only whole numbers; later chunks hold a missing
+    value, a fraction and an ATC code. Patient IDs have leading zeros.
+    """
+    df = pd.read_csv(MOCK_DATASET, index_col=0)
+    df["patient_identifier"] = [f"{100 + i:05d}" for i in range(len(df))]
+    df["sample_id"] = df["sample_id"].astype(object)
+    df.loc[9, "sample_id"] = 12.5
+    df.loc[12, "sample_id"] = None
+    df["antibiotic_code"] = df["antibiotic_code"].astype(object)
+    df.loc[19, "antibiotic_code"] = "J01CA04"
+    return df
+
+WRITERS = {
+    "csv": lambda df, path: df.to_csv(path, index=False),
+    "xlsx": lambda df, path: df.to_excel(path, index=False),
+    "json": lambda df, path: df.to_json(path, orient="records"),
+    "jsonl": lambda df, path: df.to_json(path, orient="records", lines=True),
+    "parquet": lambda df, path: df.astype({"patient_identifier": "string", "sample_id": "string", "antibiotic_code": "string"}).to_parquet(path, index=False),
+}
+
+@pytest.fixture
+def mapping_path(tmp_path):
+    path = tmp_path / "mapping.yaml"
+    path.write_text(yaml.safe_dump({"mappings": MAPPINGS}))
+    return path
+
+@pytest.mark.parametrize("extension", sorted(WRITERS))
+def test_chunked_csv_output_matches_whole_file(tmp_path, mapping_path, extension):
+    data_path = tmp_path / f"extract.{extension}"
+    WRITERS[extension](mock_frame(), data_path)
+    plan = load_plan(mapping_path)
+
+    transform_file(data_path, plan, mapping_path, tmp_path / "whole.csv")
+    transform_file(data_path, plan, mapping_path, tmp_path / "chunked.csv", options=BatchOptions(chunksize=CHUNKSIZE))
+
+    whole = (tmp_path / "whole.csv").read_bytes()
+    assert (tmp_path / "chunked.csv").read_bytes() == whole
+    numbers = pd.read_csv(tmp_path / "whole.csv", dtype=str)
+    assert numbers["Sample number culture collection"][9] == "12.5"
+    assert pd.isna(numbers["Sample number culture collection"][12])
+    assert numbers["Antibiotic Code"][19] == "J01CA04"
+    assert numbers["Patient ID"].str.startswith("0").all()
+    assert not numbers["Sample number culture collection"].str.endswith(".0").any()
+
+def test_chunked_parquet_output_keeps_fractions(tmp_path, mapping_path):
+    data_path = tmp_path / "extract.xlsx"
+    WRITERS["xlsx"](mock_frame(), data_path)
+    plan = load_plan(mapping_path)
+    options = BatchOptions(chunksize=CHUNKSIZE, output_format="parquet", partition_by=())
+
+    transform_file(data_path, plan, mapping_path, tmp_path / "dataset", options=options)
+
+    table = ds.dataset(tmp_path / "dataset").to_table()
+    assert table.num_rows == 20
+    assert "12.5" in table.column("Sample number culture collection").to_pylist()
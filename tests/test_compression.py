@@ -0,0 +1,95 @@
+"""Compression detection, streamed decompression and compressed outputs in cdmCompression."""
+import gzip
+import io
+import zipfile
+
+import pytest
+
+from cdmCompression import data_extension, decompressed, detect_compression, open_output
+
+TEXT = "id,date\n" + "".join(f"{i},2021-07-{i % 28 + 1:02d}\n" for i in range(5000))
+
+def compressions():
+    yield from ["gzip", "bz2", "zip"]
+    try:
+        import zstandard  # noqa: F401
+    except ImportError:
+        return
+    yield "zstd"
+
+SUFFIXES = {"gzip": ".gz", "bz2": ".bz2", "zip": ".zip", "zstd": ".zst"}
+
+def write(path, text=TEXT):
+    with open_output(path) as out:
+        out.write(text)
+    return path
+
+def read(source):
+    with decompressed(source) as stream:
+        return stream.read().decode("utf-8")
+
+@pytest.mark.parametrize("compression", list(compressions()))
+def test_output_reads_back(tmp_path, compression):
+    path = write(tmp_path / f"extract.csv{SUFFIXES[compression]}")
+
+    assert detect_compression(path) == compression
+    assert data_extension(path) == ".csv"
+    assert read(path) == TEXT
+
+def test_zip_member_is_named_after_the_output(tmp_path):
+    path = write(tmp_path / "extract.csv.zip")
+
+    with zipfile.ZipFile(path) as archive:
+        assert archive.namelist() == ["extract.csv"]
+
+def test_zip_without_data_suffix_takes_the_member_format(tmp_path):
+    path = tmp_path / "extract.zip"
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("export/extract.jsonl", '{"id": 1}\n')
+
+    assert data_extension(path) == ".jsonl"
+    assert data_extension("extract.zip") == ""  # a bare name, no archive to look into
+
+def test_compression_is_detected_from_content(tmp_path):
+    path = tmp_path / "extract"
+    path.write_bytes(gzip.compress(TEXT.encode("utf-8")))
+
+    assert detect_compression(path) == "gzip"
+    assert read(path) == TEXT
+
+def test_upload_is_decompressed_and_rewound():
+    upload = io.BytesIO(gzip.compress(TEXT.encode("utf-8")))
+    upload.name = "extract.csv.gz"
+
+    assert read(upload) == TEXT
+    assert read(upload) == TEXT
+
+def test_uncompressed_source_is_passed_through(tmp_path):
+    path = write(tmp_path / "extract.csv")
+
+    with decompressed(path) as source:
+        assert source == path
+
+def test_truncated_gzip_raises_value_error(tmp_path):
+    data = gzip.compress(TEXT.encode("utf-8"))
+    path = tmp_path / "extract.csv.gz"
+    path.write_bytes(data[:len(data) // 2])
+
+    with pytest.raises(ValueError, match="truncated"):
+        read(path)
+
+def test_corrupt_zip_raises_value_error(tmp_path):
+    path = tmp_path / "extract.csv.zip"
+    path.write_bytes(b"PK\x03\x04 not really a zip archive")
+
+    with pytest.raises(ValueError, match="Corrupt zip archive"):
+        read(path)
+
+def test_zip_with_several_files_raises_value_error(tmp_path):
+    path = tmp_path / "extract.zip"
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("a.csv", "id\n1\n")
+        archive.writestr("b.csv", "id\n2\n")
+
+    with pytest.raises(ValueError, match="exactly one data file"):
+        read(path)
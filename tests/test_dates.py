@@ -0,0 +1,77 @@
+"""Date format inference and parsing in cdmDates."""
+import warnings
+
+import pandas as pd
+
+from cdmDates import DateColumnReport, infer_date_format, parse_dates, warn_date_reports
+
+def parse(values, chunksize=None):
+    """Parse ``values`` whole or chunk by chunk with one report, as the transform does."""
+    report = DateColumnReport(column="date", cdm_field="Date of Surgery")
+    chunksize = chunksize or len(values)
+    parsed = pd.concat([parse_dates(pd.Series(values[i:i + chunksize]), report) for i in range(0, len(values), chunksize)])
+    return [None if pd.isna(value) else value.strftime("%Y-%m-%d %H:%M:%S") for value in parsed], report
+
+def test_pinned_order_is_not_mixed_with_the_opposite_order():
+    values = ["01/02/2021", "03/04/2021", "05/06/2021", "01/23/2021", "12/25/2021"]
+
+    whole, report = parse(values)
+    assert whole[:3] == ["2021-01-02 00:00:00", "2021-03-04 00:00:00", "2021-05-06 00:00:00"]
+    assert report.order == "month-first" and not report.ambiguous
+
+    # The first chunk fits both orders and is read day-first; the
+    # month-first values of the next chunk are then left empty, not swapped
+    chunked, report = parse(values, chunksize=3)
+    assert chunked == ["2021-02-01 00:00:00", "2021-04-03 00:00:00", "2021-06-05 00:00:00", None, None]
+    assert report.ambiguous and (report.failed, report.wrong_order) == (2, 2)
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        warn_date_reports({"date": report})
+    messages = [str(warning.message) for warning in caught]
+    assert any("fit both day-first and month-first" in message for message in messages)
+    assert any("2 of them only fit month-first" in message for message in messages)
+
+def test_utc_offset_keeps_the_local_date():
+    parsed, report = parse(["2021-06-04T01:30:00+02:00", "2021-06-04T23:30:00-0500", "2021-06-04T10:00:00.123Z"])
+
+    assert report.format == "ISO8601"
+    assert parsed == ["2021-06-04 01:30:00", "2021-06-04 23:30:00", "2021-06-04 10:00:00"]
+
+def test_infer_date_format_picks_the_format_parsing_most_values():
+    sample = pd.Series(["23/01/2021", "05/02/2021", "2021-03-01"])
+
+    assert infer_date_format(sample) == ("%d/%m/%Y", "day-first", False)
+
+def test_infer_date_format_prefers_day_first_on_a_tie_and_flags_it():
+    assert infer_date_format(pd.Series(["01/02/2021", "03/04/2021"])) == ("%d/%m/%Y", "day-first", True)
+    assert infer_date_format(pd.Series(["01/23/2021", "03/04/2021"])) == ("%m/%d/%Y", "month-first", False)
+
+def test_infer_date_format_without_a_match():
+    assert infer_date_format(pd.Series(["unknown", "n/a"])) == (None, "unknown", False)
+
+def test_failing_rows_fall_back_and_counts_are_weighted():
+    values = ["2021-07-28"] * 3 + ["29.07.2021", "29 Jul 2021", "July 30, 2021", "not a date", None]
+
+    parsed, report = parse(values)
+
+    assert parsed == ["2021-07-28 00:00:00"] * 3 + ["2021-07-29 00:00:00"] * 2 + ["2021-07-30 00:00:00", None, None]
+    assert (report.format, report.rows, report.missing) == ("%Y-%m-%d", 8, 1)
+    assert (report.parsed, report.fallback, report.failed) == (3, 3, 1)
+
+def test_format_is_pinned_by_the_first_chunk():
+    values = ["2021-07-28", "2021-07-29", "28/07/2021", "29.07.2021"]
+
+    chunked, report = parse(values, chunksize=2)
+
+    assert report.format == "%Y-%m-%d"
+    assert chunked == parse(values)[0]
+    assert (report.parsed, report.fallback) == (2, 2)
+
+def test_typed_datetimes_are_kept():
+    values = pd.to_datetime(pd.Series(["2021-07-28 10:00", None]))
+    report = DateColumnReport(column="date", cdm_field="Date of Surgery")
+
+    parsed = parse_dates(values, report)
+
+    assert report.format == "datetime64" and report.parsed == 1 and report.missing == 1
+    assert parsed[0] == pd.Timestamp("2021-07-28 10:00")
@@ -0,0 +1,87 @@
+"""Reading input files with cdmIngest."""
+import io
+
+import pandas as pd
+import pytest
+
+import cdmIngest
+from cdmIngest import _iter_array_items, iter_csv_chunks, iter_excel_chunks, read_csv, read_excel
+from cdmTransform import compile_mapping
+
+# More rows than fit in one of Arrow's default 1 MiB blocks.
+MULTILINE_ROWS = 60_000
+
+def write_multiline_csv(path):
+    # Every third note spans two lines, so some fall across a block boundary
+    notes = [f"note {i}\nmore" if i % 3 == 0 else f"note {i}" for i in range(MULTILINE_ROWS)]
+    rows = [f'{i},P{i:05d},"{note}"' for i, note in enumerate(notes)]
+    path.write_text("id,patient,note\n" + "\n".join(rows) + "\n")
+
+@pytest.mark.parametrize("engine", ["pyarrow", "c"])
+def test_csv_value_may_span_lines(tmp_path, monkeypatch, engine):
+    if engine == "pyarrow":
+        pytest.importorskip("pyarrow")
+    monkeypatch.setattr(cdmIngest, "ARROW_BLOCK_SIZE", 2**16)
+    path = tmp_path / "extract.csv"
+    write_multiline_csv(path)
+
+    whole = read_csv(path, engine=engine)
+    chunks = list(iter_csv_chunks(path, 25_000, engine=engine))
+
+    assert len(whole) == MULTILINE_ROWS
+    assert whole["note"][3] == "note 3\nmore"
+    assert whole["note"][4] == "note 4"
+    assert [len(chunk) for chunk in chunks] == [25_000, 25_000, 10_000]
+    pd.testing.assert_frame_equal(pd.concat(chunks).astype(str), whole.astype(str))
+
+def write_formatted_sheet(path):
+    """Five data rows (one of them blank), text IDs with leading zeros and a bold but empty cell below the data."""
+    openpyxl = pytest.importorskip("openpyxl")
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(["patient_identifier", "sample_id"])
+    for i in range(5):
+        sheet.append([None, None] if i == 2 else [f"{100 + i:05d}", i])
+    sheet["A12"].font = openpyxl.styles.Font(bold=True)
+    workbook.save(path)
+
+def test_excel_chunks_match_whole_sheet(tmp_path):
+    path = tmp_path / "extract.xlsx"
+    write_formatted_sheet(path)
+    plan = compile_mapping({"patient_identifier": {"cdm_field": "Patient ID"}, "sample_id": {"cdm_field": "Sample number culture collection"}})
+
+    whole = read_excel(path, plan)
+    chunks = list(iter_excel_chunks(path, 3, plan))
+
+    assert whole["patient_identifier"].tolist()[:2] == ["00100", "00101"]
+    assert len(whole) == 5
+    assert [len(chunk) for chunk in chunks] == [3, 2]
+    pd.testing.assert_frame_equal(pd.concat(chunks), whole)
+
+def array_items(text, monkeypatch, block_size=4):
+    """The items of a JSON array whose opening bracket was read, decoded in small blocks."""
+    monkeypatch.setattr(cdmIngest, "JSON_BLOCK_SIZE", block_size)
+    return list(_iter_array_items(io.StringIO(text)))
+
+@pytest.mark.parametrize("text, items", [
+    (' {"a": 1}, {"a": [2, 3]} ,{"b": "x]"}]', [{"a": 1}, {"a": [2, 3]}, {"b": "x]"}]),
+    ("12345, 67890, -1.5e3]", [12345, 67890, -1500.0]),
+    ("  ]", []),
+    ('"only"]', ["only"]),
+])
+def test_json_array_items_across_blocks(monkeypatch, text, items):
+    assert array_items(text, monkeypatch) == items
+    assert array_items(text, monkeypatch, block_size=2**20) == items
+
+@pytest.mark.parametrize("text, message", [
+    ('{"a": 1}', "missing"),
+    ('{"a": 1},', "missing"),
+    ("", "missing"),
+    ('{"a": 1} {"a": 2}]', "Expected ','"),
+    ('{"a": 1},]', "Expecting value"),
+    ("1,,2]", "Expecting value"),
+    ('{"a": 1', "line 1"),
+])
+def test_malformed_json_array_raises_value_error(monkeypatch, text, message):
+    with pytest.raises(ValueError, match=message):
+        array_items(text, monkeypatch)
@@ -0,0 +1,32 @@
+"""The CSV download handed to Streamlit."""
+import gzip
+import io
+
+import pandas as pd
+
+from cdmOutput import spool_csv, spool_reader
+
+# Data types st.download_button accepts (streamlit 1.40 to 1.65); anything else is rejected.
+DOWNLOAD_DATA_TYPES = (str, bytes, io.TextIOWrapper, io.StringIO, io.BytesIO, io.BufferedReader, io.RawIOBase)
+
+def cdm_frame():
+    return pd.DataFrame({
+        "Patient ID": ["00123", "456"],
+        "Date of Surgery": pd.to_datetime(["2021-07-28", None]),
+    })
+
+def test_download_data_is_a_type_streamlit_accepts():
+    spool = spool_csv(cdm_frame())
+    assert not isinstance(spool, DOWNLOAD_DATA_TYPES)  # hence spool_reader
+
+    data = spool_reader(spool)
+    assert isinstance(data, DOWNLOAD_DATA_TYPES) or callable(data)
+    assert data() == b"Patient ID,Date of Surgery\n00123,28/07/2021\n456,\n"
+
+def test_download_data_can_be_read_again():
+    data = spool_reader(spool_csv(cdm_frame(), "gzip"))
+
+    first = data()
+    assert isinstance(first, bytes)
+    assert data() == first
+    assert gzip.decompress(first).decode("utf-8").startswith("Patient ID,Date of Surgery\n00123,")
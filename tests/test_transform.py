@@ -0,0 +1,38 @@
+"""Value mappings built in mapApp applied by the transform."""
+import yaml
+
+from cdmBatch import load_plan, transform_file
+from cdmIngest import read_data
+from cdmProfile import column_stats
+
+def write_mapping_like_map_app(data_path, mapping_path, cdm_field, column, targets, engine=None):
+    """A mapping YAML whose value keys come from reading the data file without a plan, as mapApp does."""
+    counts = column_stats(read_data(data_path, engine=engine))[column].counts
+    value_mapping = {value: targets[str(value).lower()] for value in counts.index}
+    with open(mapping_path, "w") as yaml_file:
+        yaml.dump({"mappings": {column: {"cdm_field": cdm_field, "transformation": {"value_mapping": value_mapping}}}}, yaml_file)
+
+def test_value_mapping_applies_to_inferred_booleans(tmp_path):
+    data_path = tmp_path / "extract.csv"
+    data_path.write_text("id,positive\n1,true\n2,false\n3,true\n4,\n")
+    mapping_path = tmp_path / "mapping.yaml"
+    write_mapping_like_map_app(data_path, mapping_path, "Result", "positive", {"true": "positive", "false": "negative"})
+
+    transform_file(data_path, load_plan(mapping_path), mapping_path, tmp_path / "cdm.csv")
+
+    lines = (tmp_path / "cdm.csv").read_text().splitlines()
+    column = lines[0].split(",").index("Result")
+    assert [line.split(",")[column] for line in lines[1:]] == ["positive", "negative", "positive", ""]
+
+def test_value_mapping_applies_to_inferred_floats(tmp_path):
+    # pandas' C parser reads whole numbers with a gap as floats: keys 1.0 and 2.0
+    data_path = tmp_path / "extract.csv"
+    data_path.write_text("id,side\n1,1\n2,2\n3,\n")
+    mapping_path = tmp_path / "mapping.yaml"
+    write_mapping_like_map_app(data_path, mapping_path, "Operation Side", "side", {"1.0": "left", "2.0": "right"}, engine="c")
+
+    transform_file(data_path, load_plan(mapping_path), mapping_path, tmp_path / "cdm.csv")
+
+    lines = (tmp_path / "cdm.csv").read_text().splitlines()
+    column = lines[0].split(",").index("Operation Side")
+    assert [line.split(",")[column] for line in lines[1:]] == ["left", "right", ""]